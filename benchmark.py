@@ -0,0 +1,358 @@
+import os
+import sys
+import csv
+import json
+import time
+import random
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+
+from crossword_csp import CrosswordCSP, INDEX_BACKENDS
+
+# Frequência aproximada das letras em português, por mil letras
+LETTER_WEIGHTS = {
+    'A': 146, 'E': 126, 'O': 107, 'S': 78, 'R': 65, 'I': 62, 'N': 50, 'D': 50, 'M': 47,
+    'U': 46, 'T': 43, 'C': 39, 'L': 28, 'P': 25, 'V': 17, 'G': 13, 'H': 13, 'Q': 12,
+    'B': 10, 'F': 10, 'Z': 5, 'J': 4, 'X': 2, 'K': 1, 'W': 1, 'Y': 1,
+}
+
+# Casos da suíte padrão: nome, linhas, colunas, densidade de casas pretas, palavras, semente
+SUITE = [
+    ('aberto-5x5', 5, 5, 0.0, 1500, 1),
+    ('aberto-6x6', 6, 6, 0.0, 3000, 1),
+    ('9x9-d20', 9, 9, 0.20, 3000, 2),
+    ('13x13-d22', 13, 13, 0.22, 8000, 4),
+    ('15x15-d20', 15, 15, 0.20, 8000, 5),
+    ('15x15-d25-200k', 15, 15, 0.25, 200000, 5),
+]
+
+METRICS = ['status', 'slots', 'solve_time', 'total_time', 'nodes', 'backtracks', 'backjumps',
+           'wipeouts', 'peak_rss_mb']
+
+MIN_TIME_DELTA = 0.05  # Diferenças de tempo menores que isso (segundos) são ruído
+
+
+def generate_grid(rows, cols, density, seed):
+    """Random grid with rotationally symmetric black cells and no unused white cells.
+
+    Returns the rows as strings of '?' (white) and '.' (black).
+    """
+    rng = random.Random(seed)
+    grid = [['?'] * cols for _ in range(rows)]
+    cells = [(r, c) for r in range(rows) for c in range(cols)]
+    rng.shuffle(cells)
+    blacks = 0
+    target = round(density * rows * cols)
+    for r, c in cells:
+        if blacks >= target:
+            break
+        if grid[r][c] == '.':
+            continue
+        for cell_r, cell_c in {(r, c), (rows - 1 - r, cols - 1 - c)}:
+            grid[cell_r][cell_c] = '.'
+            blacks += 1
+
+    # Uma casa branca fora de qualquer slot nunca seria preenchida
+    def in_slot(r, c):
+        horizontal = (c > 0 and grid[r][c - 1] == '?') or (c + 1 < cols and grid[r][c + 1] == '?')
+        vertical = (r > 0 and grid[r - 1][c] == '?') or (r + 1 < rows and grid[r + 1][c] == '?')
+        return horizontal or vertical
+
+    changed = True
+    while changed:
+        changed = False
+        for r in range(rows):
+            for c in range(cols):
+                if grid[r][c] == '?' and not in_slot(r, c):
+                    grid[r][c] = '.'
+                    changed = True
+    return [''.join(row) for row in grid]
+
+
+def plant_solution(grid_file, seed):
+    """Fill the white cells of a grid file with random letters.
+
+    Returns the letter of each white cell and the words of the slots; adding
+    these words to a wordlist guarantees that the grid has a solution.
+    """
+    rng = random.Random(seed)
+    alphabet, weights = zip(*LETTER_WEIGHTS.items())
+    solver = CrosswordCSP(grid_file, os.devnull)
+    solver.load_grid()
+    solver.identify_slots()
+    letters = {}
+    for r, row in enumerate(solver.grid):
+        for c, cell in enumerate(row):
+            if cell == '?':
+                letters[(r, c)] = rng.choices(alphabet, weights)[0]
+    words = [''.join(letters[cell] for cell in solver.slot_cells(slot)) for slot in solver.slots]
+    return letters, words
+
+
+def add_hints(grid, letters, hints, seed):
+    """Pre-fill hints random white cells of grid with their planted letters."""
+    rng = random.Random(seed)
+    rows = [list(row) for row in grid]
+    for r, c in rng.sample(sorted(letters), min(hints, len(letters))):
+        rows[r][c] = letters[(r, c)]
+    return [''.join(row) for row in rows]
+
+
+def generate_wordlist(size, length_weights, seed, planted=()):
+    """Seeded list of size distinct random words, starting with the planted ones.
+
+    length_weights maps word lengths to their relative frequency; letters
+    follow LETTER_WEIGHTS.
+    """
+    rng = random.Random(seed)
+    alphabet, weights = zip(*LETTER_WEIGHTS.items())
+    lengths, length_freqs = zip(*sorted(length_weights.items()))
+    words = dict.fromkeys(planted)
+    while len(words) < size:
+        length = rng.choices(lengths, length_freqs)[0]
+        words[''.join(rng.choices(alphabet, weights, k=length))] = None
+    words = list(words)
+    rng.shuffle(words)
+    return words
+
+
+def parse_lengths(text):
+    """Parse a length distribution such as '3:1,4:2,5:3' into {3: 1, 4: 2, 5: 3}."""
+    length_weights = {}
+    for item in text.split(','):
+        length, _, weight = item.partition(':')
+        length_weights[int(length)] = float(weight or 1)
+    return length_weights
+
+
+def write_lines(path, lines):
+    """Write one item per line."""
+    with open(path, 'w') as f:
+        for line in lines:
+            f.write(line + '\n')
+
+
+def prepare_case(name, rows, cols, density, words, seed, directory):
+    """Generate the grid and the wordlist of a suite case; returns their paths."""
+    grid_file = os.path.join(directory, f'{name}.txt')
+    words_file = os.path.join(directory, f'{name}-palavras.txt')
+    write_lines(grid_file, generate_grid(rows, cols, density, seed))
+    _, planted = plant_solution(grid_file, seed)
+    # Distribuição uniforme entre os comprimentos usados pelo grid
+    length_weights = {len(word): 1 for word in planted}
+    write_lines(words_file, generate_wordlist(words, length_weights, seed, planted))
+    return grid_file, words_file
+
+
+def measure_case(grid_file, words_file, options):
+    """Solve one grid in this process and return its metrics."""
+    start = time.time()
+    solver = CrosswordCSP(grid_file, words_file, **options)
+    solver.load_grid()
+    solver.identify_slots()
+    solver.load_words()
+    solver.initialize_domains()
+    solver.solve()
+    result = {'status': solver.status, 'slots': len(solver.slots), 'solve_time': solver.elapsed_time,
+              'total_time': time.time() - start}
+    result.update(solver.stats.counters())
+    # ru_maxrss é dado em kilobytes no Linux
+    result['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result
+
+
+def run_case(grid_file, words_file, options):
+    """Measure one grid in a fresh interpreter, so peak memory is its own."""
+    command = [sys.executable, os.path.abspath(__file__), 'case', grid_file, words_file,
+               '--options', json.dumps(options)]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {'status': 'erro', 'error': completed.stderr.strip().splitlines()[-1:]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run_suite(cases, options, repeat, directory):
+    """Run every case repeat times and keep the fastest run of each."""
+    results = []
+    for name, rows, cols, density, words, seed in cases:
+        grid_file, words_file = prepare_case(name, rows, cols, density, words, seed, directory)
+        runs = [run_case(grid_file, words_file, options) for _ in range(repeat)]
+        best = min(runs, key=lambda run: run.get('total_time', float('inf')))
+        best.update(case=name, rows=rows, cols=cols, density=density, words=words, seed=seed)
+        results.append(best)
+        print(f"  {name}: {best['status']}, {best.get('nodes', 0)} nós, {best.get('solve_time', 0):.3f} s")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of results against a baseline run, as readable strings.
+
+    A metric regresses when it grows by more than tolerance (a fraction);
+    times must also grow by more than MIN_TIME_DELTA seconds.
+    """
+    base_cases = {case['case']: case for case in baseline['cases']}
+    regressions = []
+    for result in results:
+        base = base_cases.get(result['case'])
+        if base is None:
+            continue
+        if base['status'] == 'solved' and result['status'] != 'solved':
+            regressions.append(f"{result['case']}: status {base['status']} -> {result['status']}")
+            continue
+        for metric in ('solve_time', 'total_time', 'nodes', 'peak_rss_mb'):
+            old, new = base.get(metric), result.get(metric)
+            if old is None or new is None or new <= old * (1 + tolerance):
+                continue
+            if metric.endswith('_time') and new - old <= MIN_TIME_DELTA:
+                continue
+            regressions.append(f"{result['case']}: {metric} {old:.3f} -> {new:.3f} "
+                               f"(+{(new / old - 1) * 100 if old else float('inf'):.0f}%)")
+    return regressions
+
+
+def write_csv(path, results):
+    """Write one row per case."""
+    columns = ['case', 'rows', 'cols', 'density', 'words', 'seed'] + METRICS
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, columns, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def command_run(args):
+    cases = [case for case in SUITE if not args.cases or case[0] in args.cases]
+    if not cases:
+        print("Erro: Nenhum caso de benchmark selecionado.")
+        return 1
+    options = {'propagation': args.propagation, 'search': args.search, 'seed': args.seed,
+               'time_limit': args.time_limit, 'backend': args.backend}
+
+    print(f"Executando {len(cases)} casos ({args.repeat} repetição(ões) cada)...")
+    if args.keep_files:
+        os.makedirs(args.keep_files, exist_ok=True)
+        results = run_suite(cases, options, args.repeat, args.keep_files)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            results = run_suite(cases, options, args.repeat, directory)
+
+    report = {'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'python': platform.python_version(),
+              'machine': platform.machine(), 'options': options, 'cases': results}
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Resultados salvos em {args.json}")
+    if args.csv:
+        write_csv(args.csv, results)
+        print(f"Resultados salvos em {args.csv}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('options') != options:
+            print(f"Aviso: a baseline foi gerada com outras opções: {baseline.get('options')}")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regressão(ões) em relação a {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"\nNenhuma regressão em relação a {args.baseline} (tolerância {args.tolerance:.0%})")
+    return 0
+
+
+def command_grid(args):
+    rows, _, cols = args.size.partition('x')
+    grid = generate_grid(int(rows), int(cols or rows), args.density, args.seed)
+    write_lines(args.output, grid)
+    print(f"Grid {rows}x{cols or rows} salvo em {args.output}")
+    if args.wordlist:
+        letters, planted = plant_solution(args.output, args.seed)
+        if args.hints:
+            write_lines(args.output, add_hints(grid, letters, args.hints, args.seed))
+            print(f"{args.hints} letras da solução plantada pré-preenchidas no grid")
+        length_weights = parse_lengths(args.lengths) if args.lengths else {len(word): 1 for word in planted}
+        write_lines(args.wordlist, generate_wordlist(args.words, length_weights, args.seed, planted))
+        print(f"Lista com {args.words} palavras (solução garantida) salva em {args.wordlist}")
+    return 0
+
+
+def command_wordlist(args):
+    write_lines(args.output, generate_wordlist(args.words, parse_lengths(args.lengths), args.seed))
+    print(f"Lista com {args.words} palavras salva em {args.output}")
+    return 0
+
+
+def command_case(args):
+    print(json.dumps(measure_case(args.grid_file, args.words_file, json.loads(args.options))))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark reproduzível do solver com grids e listas de palavras sintéticos')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='Executa a suíte de benchmark')
+    run.add_argument('--cases', nargs='+', help=f"Casos a executar (default: todos: {', '.join(c[0] for c in SUITE)})")
+    run.add_argument('--propagation', choices=['fc', 'mac'], default='fc',
+                     help='Propagação de restrições durante a busca (default: fc)')
+    run.add_argument('--search', choices=['backtrack', 'cbj'], default='backtrack',
+                     help='Estratégia de busca (default: backtrack)')
+    run.add_argument('--backend', choices=sorted(INDEX_BACKENDS), default='bitset',
+                     help='Representação dos domínios (default: bitset)')
+    run.add_argument('--seed', type=int, default=None,
+                     help='Semente para o desempate das heurísticas')
+    run.add_argument('--time-limit', type=float, default=60,
+                     help='Tempo máximo de busca por caso, em segundos (default: 60)')
+    run.add_argument('--repeat', type=int, default=1,
+                     help='Execuções por caso; vale a mais rápida (default: 1)')
+    run.add_argument('--json', help='Salva os resultados em JSON (pode ser usado como baseline)')
+    run.add_argument('--csv', help='Salva os resultados em CSV')
+    run.add_argument('--baseline', help='JSON de uma execução anterior para comparar')
+    run.add_argument('--tolerance', type=float, default=0.2,
+                     help='Aumento relativo tolerado antes de acusar regressão (default: 0.2)')
+    run.add_argument('--keep-files', metavar='DIR',
+                     help='Mantém os grids e listas gerados neste diretório')
+    run.set_defaults(handler=command_run)
+
+    grid = commands.add_parser('grid', help='Gera um grid sintético')
+    grid.add_argument('size', help='Dimensões, ex.: 15x15')
+    grid.add_argument('output', help='Arquivo de saída do grid')
+    grid.add_argument('--density', type=float, default=0.2,
+                      help='Fração de casas pretas (default: 0.2)')
+    grid.add_argument('--seed', type=int, default=0, help='Semente (default: 0)')
+    grid.add_argument('--wordlist', help='Também gera uma lista de palavras com uma solução plantada')
+    grid.add_argument('--words', type=int, default=20000,
+                      help='Tamanho da lista gerada com --wordlist (default: 20000)')
+    grid.add_argument('--hints', type=int, default=0,
+                      help='Pré-preenche este número de casas com letras da solução plantada (requer --wordlist)')
+    grid.add_argument('--lengths', help='Distribuição de comprimentos, ex.: 3:1,4:2,5:3 '
+                                        '(default: comprimentos do grid)')
+    grid.set_defaults(handler=command_grid)
+
+    wordlist = commands.add_parser('wordlist', help='Gera uma lista de palavras sintética')
+    wordlist.add_argument('output', help='Arquivo de saída da lista')
+    wordlist.add_argument('--words', type=int, default=20000, help='Número de palavras (default: 20000)')
+    wordlist.add_argument('--lengths', default='3:2,4:4,5:6,6:6,7:5,8:4,9:3,10:2,11:1,12:1',
+                          help='Distribuição de comprimentos, ex.: 3:1,4:2,5:3')
+    wordlist.add_argument('--seed', type=int, default=0, help='Semente (default: 0)')
+    wordlist.set_defaults(handler=command_wordlist)
+
+    # Usado internamente por run_case
+    case = commands.add_parser('case')
+    case.add_argument('grid_file')
+    case.add_argument('words_file')
+    case.add_argument('--options', default='{}')
+    case.set_defaults(handler=command_case)
+
+    args = parser.parse_args()
+    # As dicas vêm da solução plantada, que só existe com --wordlist
+    if args.handler is command_grid and args.hints and not args.wordlist:
+        grid.error('--hints requer --wordlist')
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,48 +1,878 @@
+import sys
 import time
 import os
+import mmap
 import random
+import resource
+import multiprocessing
+from multiprocessing.connection import wait
+import heapq
+import struct
+import hashlib
 import argparse
-from collections import defaultdict
+import json
+import cProfile
+import pstats
+from collections import OrderedDict, defaultdict, deque
+from collections.abc import Sequence
+
+try:
+    import numpy as np
+except ImportError:  # Only needed by the numpy backend
+    np = None
+
+# Compiled dictionary layout: header, one entry per word length, then one
+# fixed-width block of encoded words per length (see compile_dictionary)
+DICT_MAGIC = b'CWDICT1\0'
+DICT_HEADER = struct.Struct('<8s32sdQQI')  # magic, sha256, mtime, size, words, blocks
+DICT_ENTRY = struct.Struct('<IIIQ')  # length, bytes per char, word count, offset
+
+NOGOOD_LIMIT = 2000  # Nogoods kept by conflict-directed backjumping before LRU eviction
+NOGOOD_MAX_CELLS = 4  # Larger conflicts are too specific to be worth storing as nogoods
+
+# Checkpoint layout: header, then the search counters, restart RNG state,
+# solved components, search stack and nogood store (see write_checkpoint)
+CHECKPOINT_MAGIC = b'CWCKPT2\0'
+# magic, wordlist and grid sha256, slots, search, propagation, restarts, distinct words,
+# has seed, seed, restart cutoff (-1 for none), component number, max depth
+CHECKPOINT_HEADER = struct.Struct('<8s32s32sIBBBBBqqII')
+CHECKPOINT_INTERVAL = 300.0  # Default seconds between checkpoints
+SEARCHES = ('backtrack', 'cbj')
+PROPAGATIONS = ('fc', 'mac')
+
+COUNT_CACHE_LIMIT = 200000  # Component counts kept by count_search before LRU eviction
+
+RESTART_BASE_NODES = 1000  # Node cutoff of the i-th restart is this times the i-th Luby term
+EXIT_BUDGET_EXHAUSTED = 3  # Exit status when the time or node budget ran out without an answer
+PROGRESS_INTERVAL = 10.0  # Seconds between progress lines during the search
+STOP_CHECK_INTERVAL = 0.1  # Seconds between checks of the portfolio stop event
+PORTFOLIO_GRACE = 1.0  # Seconds the losing portfolio workers get to report before they are terminated
+
+
+def wordlist_digest(words_file):
+    """SHA-256 digest of the wordlist contents."""
+    digest = hashlib.sha256()
+    with open(words_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def luby(i):
+    """The i-th term (from 1) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, ..."""
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    if i == (1 << k) - 1:
+        return 1 << (k - 1)
+    return luby(i - (1 << (k - 1)) + 1)
+
+
+def read_wordlist(words_file, lengths=None):
+    """Stream a wordlist, keeping the distinct words of the given lengths (all when None).
+    
+    Returns a map from length to the words in first-seen order, plus the
+    number of words read, of words skipped for their length, of characters in
+    those and of duplicates dropped.
+    """
+    words_by_length = defaultdict(list)
+    word_count = skipped = skipped_chars = 0
+    with open(words_file, 'r') as f:
+        rest = ''
+        while True:
+            chunk = f.read(1 << 20)
+            text = rest + chunk
+            # Keep a partial last line for the next chunk
+            cut = text.rfind('\n') if chunk else len(text)
+            rest = text[cut + 1:]
+            for line in text[:cut].upper().split('\n'):
+                word = line.strip()
+                if not word:  # Skip empty lines
+                    continue
+                word_count += 1
+                # Print progress for very large files
+                if word_count % 100000 == 0:
+                    print(f"Read {word_count} words...")
+                length = len(word)
+                if lengths is None or length in lengths:
+                    words_by_length[length].append(word)
+                else:
+                    skipped += 1
+                    skipped_chars += length
+            if not chunk:
+                break
+    
+    duplicates = 0
+    for length, words in words_by_length.items():
+        distinct = list(dict.fromkeys(words))
+        duplicates += len(words) - len(distinct)
+        words_by_length[length] = distinct
+    return words_by_length, word_count, skipped, skipped_chars, duplicates
+
+
+def encode_words(words):
+    """Encode words of one length as a fixed-width block; returns (bytes per char, data)."""
+    text = ''.join(words)
+    try:
+        return 1, text.encode('latin-1')
+    except UnicodeEncodeError:  # Fall back to a fixed 4 bytes per char
+        return 4, text.encode('utf-32-le')
+
+
+def compile_dictionary(words_file, output_file):
+    """Write the distinct words as a binary file of fixed-width blocks, one per word length."""
+    words_by_length = read_wordlist(words_file)[0]
+    
+    blocks = []
+    for length, words in sorted(words_by_length.items()):
+        char_size, data = encode_words(words)
+        blocks.append((length, char_size, len(words), data))
+    
+    stat = os.stat(words_file)
+    offset = DICT_HEADER.size + DICT_ENTRY.size * len(blocks)
+    tmp_file = output_file + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(DICT_HEADER.pack(DICT_MAGIC, wordlist_digest(words_file), stat.st_mtime, stat.st_size,
+                                 sum(count for _, _, count, _ in blocks), len(blocks)))
+        for length, char_size, count, data in blocks:
+            f.write(DICT_ENTRY.pack(length, char_size, count, offset))
+            offset += len(data)
+        for _, _, _, data in blocks:
+            f.write(data)
+    os.replace(tmp_file, output_file)
+    return sum(count for _, _, count, _ in blocks)
+
+
+class WordBlock(Sequence):
+    """Read-only view of the words of one length inside a compiled dictionary buffer.
+
+    Words are decoded on access, so a domain can hold word ids into the
+    buffer instead of one str object per word.
+    """
+    __slots__ = ('buffer', 'offset', 'count', 'length', 'char_size', 'width', 'encoding')
+
+    def __init__(self, buffer, offset, count, length, char_size):
+        self.buffer = buffer
+        self.offset = offset
+        self.count = count
+        self.length = length
+        self.char_size = char_size
+        self.width = length * char_size
+        self.encoding = 'latin-1' if char_size == 1 else 'utf-32-le'
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.count:
+            raise IndexError('word id out of range')
+        start = self.offset + i * self.width
+        return self.buffer[start:start + self.width].decode(self.encoding)
+
+    def column(self, pos):
+        """All letters at position pos, in word id order."""
+        end = self.offset + self.count * self.width
+        if self.char_size == 1:
+            return self.buffer[self.offset + pos:end:self.width].decode(self.encoding)
+        return self.buffer[self.offset:end].decode(self.encoding)[pos::self.length]
+
+    def word_set(self):
+        """All the words as a set of str, decoded in one pass over the block."""
+        text = self.buffer[self.offset:self.offset + self.count * self.width].decode(self.encoding)
+        return {text[i:i + self.length] for i in range(0, len(text), self.length)}
+
+
+class WordIndex:
+    """Positional letter index over the words of a single length.
+
+    Word ids are positions in `words`. A set of word ids (a domain) is stored
+    as a Python int used as a bitset, so restricting a domain to the words
+    with a given letter at a given position is a single AND.
+    """
+    __slots__ = ('words', 'length', 'full', 'positions')
+
+    def __init__(self, words, length):
+        self.words = words
+        self.length = length
+        self.full = (1 << len(words)) - 1  # Bitset with every word id
+        # positions[pos][letter] -> bitset of word ids with letter at pos
+        self.positions = [self._index_column(pos) for pos in range(length)]
+
+    def _index_column(self, pos):
+        """Build the letter -> bitset map for one position."""
+        if isinstance(self.words, WordBlock):
+            column = self.words.column(pos)
+        else:
+            column = ''.join(word[pos] for word in self.words)
+        letters = set(column)
+        index = {}
+        for letter in letters:
+            # Map the column to a '0'/'1' string, least significant bit first
+            table = {ord(other): '0' for other in letters}
+            table[ord(letter)] = '1'
+            index[letter] = int(column.translate(table)[::-1], 2)
+        return index
+
+    def matching(self, pos, letter):
+        """Bitset of word ids that have letter at pos."""
+        return self.positions[pos].get(letter, 0)
+
+    def count(self, bits):
+        """Number of word ids in a bitset."""
+        return bits.bit_count()
+
+    def histogram(self, bits, pos):
+        """Count the words in a bitset by their letter at pos."""
+        if bits.bit_count() <= 32:  # Reading a few words beats one AND per letter
+            words = self.words
+            histogram = {}
+            for i in self.ids(bits):
+                letter = words[i][pos]
+                histogram[letter] = histogram.get(letter, 0) + 1
+            return histogram
+        
+        histogram = {}
+        for letter, letter_bits in self.positions[pos].items():
+            count = (bits & letter_bits).bit_count()
+            if count:
+                histogram[letter] = count
+        return histogram
+
+    def ids(self, bits):
+        """Yield the word ids in a bitset in increasing order."""
+        digits = bin(bits)[:1:-1]
+        i = digits.find('1')
+        while i >= 0:
+            yield i
+            i = digits.find('1', i + 1)
+
+    def words_in(self, bits):
+        """List the words in a bitset in word id order."""
+        words = self.words
+        return [words[i] for i in self.ids(bits)]
+
+    def domain_bytes(self, bits):
+        """The word ids of a bitset as bytes, equal for equal domains."""
+        return bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+
+    def order_by_conflicts(self, bits, neighbour_conflicts, salt=None):
+        """List the words in a bitset by increasing number of conflicts (for LCV).
+
+        neighbour_conflicts holds (pos, conflicts per letter, conflicts for any
+        other letter) for every unassigned neighbour, where pos is the overlap
+        position in these words. Ties keep word id order, or follow a salted
+        hash of the word id when salt is given.
+        """
+        words = self.words
+
+        def count_conflicts(i):
+            word = words[i]
+            return sum(conflicts.get(word[pos], size) for pos, conflicts, size in neighbour_conflicts)
+
+        if salt is None:
+            # sorted is stable, so ties keep word id order and the ordering is deterministic
+            return [words[i] for i in sorted(self.ids(bits), key=count_conflicts)]
+        scored = [(count_conflicts(i), (i * 2654435761 ^ salt) & 0xFFFFFFFF, i) for i in self.ids(bits)]
+        scored.sort()
+        return [words[i] for _, _, i in scored]
+
+
+class NumpyWordIndex:
+    """WordIndex backed by numpy: a letter matrix and boolean mask domains.
+
+    The words of one length are stored as an (n_words x length) matrix of
+    letter codes (uint8, viewed directly on a latin-1 compiled dictionary
+    block), with a contiguous copy of each column, and a domain is a boolean
+    mask over word ids. Filtering, counting and letter histograms are
+    vectorized. The interface and the orderings are
+    the same as WordIndex, so both backends find the same solutions.
+    """
+    __slots__ = ('words', 'length', 'full', 'matrix', 'columns', 'letters', 'codes', 'masks')
+
+    def __init__(self, words, length):
+        if np is None:
+            raise ImportError("The numpy backend requires numpy")
+        self.words = words
+        self.length = length
+        self.matrix, self.letters = self._letter_matrix(words, length)
+        self.columns = [np.ascontiguousarray(self.matrix[:, pos]) for pos in range(length)]
+        self.codes = {letter: code for code, letter in enumerate(self.letters) if letter}
+        self.full = np.ones(len(words), dtype=bool)
+        self.masks = {}  # Maps (pos, letter) to the mask of words with letter at pos, built on first use
+
+    @staticmethod
+    def _letter_matrix(words, length):
+        """Letter code matrix of the words and the letter of each code ('' if unused)."""
+        if isinstance(words, WordBlock) and words.char_size == 1:
+            # Latin-1 codes are the bytes themselves: view the mapped block without copying
+            matrix = np.frombuffer(words.buffer, dtype=np.uint8, count=words.count * length,
+                                   offset=words.offset).reshape(words.count, length)
+        else:
+            text = ''.join(words)
+            codepoints = np.frombuffer(text.encode('utf-32-le'), dtype='<u4').reshape(len(words), length)
+            if not len(words) or codepoints.max() < 256:
+                matrix = codepoints.astype(np.uint8)
+            else:
+                # Number the letters densely so that histograms stay small
+                used, inverse = np.unique(codepoints, return_inverse=True)
+                return inverse.reshape(len(words), length).astype(np.uint32), [chr(c) for c in used]
+        return matrix, [chr(c) for c in range(256)]
+
+    def matching(self, pos, letter):
+        """Mask of word ids that have letter at pos."""
+        mask = self.masks.get((pos, letter))
+        if mask is None:
+            code = self.codes.get(letter)
+            if code is None:
+                mask = np.zeros(len(self.words), dtype=bool)
+            else:
+                mask = self.columns[pos] == code
+            self.masks[(pos, letter)] = mask
+        return mask
+
+    def count(self, mask):
+        """Number of word ids in a mask."""
+        return int(np.count_nonzero(mask))
+
+    def histogram(self, mask, pos):
+        """Count the words in a mask by their letter at pos."""
+        counts = np.bincount(self.columns[pos][mask], minlength=len(self.letters))
+        letters = self.letters
+        return {letters[code]: int(counts[code]) for code in np.flatnonzero(counts)}
+
+    def ids(self, mask):
+        """Yield the word ids in a mask in increasing order."""
+        return iter(np.flatnonzero(mask).tolist())
+
+    def words_in(self, mask):
+        """List the words in a mask in word id order."""
+        words = self.words
+        return [words[i] for i in np.flatnonzero(mask).tolist()]
+
+    def domain_bytes(self, mask):
+        """The word ids of a mask as bytes, equal for equal domains."""
+        return np.packbits(mask).tobytes()
+
+    def order_by_conflicts(self, mask, neighbour_conflicts, salt=None):
+        """List the words in a mask by increasing number of conflicts (see WordIndex)."""
+        ids = np.flatnonzero(mask)
+        total = np.zeros(len(ids), dtype=np.int64)
+        for pos, conflicts, size in neighbour_conflicts:
+            # Conflicts per letter code, size for letters the neighbour does not have
+            table = np.full(len(self.letters), size, dtype=np.int64)
+            for letter, count in conflicts.items():
+                code = self.codes.get(letter)
+                if code is not None:
+                    table[code] = count
+            total += table[self.columns[pos][ids]]
+        if salt is None:
+            order = np.argsort(total, kind='stable')
+        else:
+            hashes = (ids.astype(np.uint64) * np.uint64(2654435761) ^ np.uint64(salt)) & np.uint64(0xFFFFFFFF)
+            order = np.lexsort((ids, hashes, total))
+        words = self.words
+        return [words[i] for i in ids[order].tolist()]
+
+
+INDEX_BACKENDS = {'bitset': WordIndex, 'numpy': NumpyWordIndex}
+
+
+class WordDictionary:
+    """Words grouped by length, plus their letter indexes.
+    
+    One dictionary can be shared by several CrosswordCSP instances (batch mode),
+    so the wordlist is loaded and each length is indexed only once.
+    """
+
+    def __init__(self, words_file, dict_file=None, backend='bitset'):
+        self.words_file = words_file
+        self.dict_file = dict_file or words_file + '.cwdict'  # Compiled dictionary cache
+        self.backend = backend  # Key of INDEX_BACKENDS used to index each length
+        self.buffer = None  # mmap of the compiled dictionary, when used
+        self.digest = None  # SHA-256 of the wordlist, when known
+        self.words_by_length = defaultdict(list)  # Dictionary of words by length for faster lookup
+        self.indexes = {}  # Maps word lengths to their WordIndex (or NumpyWordIndex)
+        self.load_log = []  # Log lines describing how the words were loaded
+        self.loaded_lengths = set()  # Word lengths loaded so far, None once all of them are
+        self.compiled_checked = False
+        self.stat = None  # os.stat of the wordlist when its words were first loaded
+
+    def load(self, lengths=None):
+        """Load the words of the given lengths (every length when None).
+        
+        An up-to-date compiled dictionary makes every length available at once.
+        Otherwise the wordlist is streamed, keeping only the lengths not loaded
+        yet, and the distinct words of each length are packed into a WordBlock
+        over a bytes buffer instead of one str object per word.
+        """
+        if self.loaded_lengths is None:
+            return
+        if self.stat is None:
+            self.stat = os.stat(self.words_file)
+        if not self.compiled_checked:
+            self.compiled_checked = True
+            if self.load_compiled():
+                self.loaded_lengths = None
+                return
+        
+        missing = None if lengths is None else set(lengths) - self.loaded_lengths
+        if missing is not None and not missing:
+            return
+        self.load_text(missing)
+        if missing is None:
+            self.loaded_lengths = None
+        else:
+            self.loaded_lengths |= missing
+
+    def load_text(self, lengths):
+        """Stream the wordlist and pack the words of lengths (all when None, minus loaded ones)."""
+        start = time.time()
+        words_by_length, word_count, skipped, skipped_chars, duplicates = read_wordlist(self.words_file, lengths)
+        
+        kept = 0
+        store_size = 0
+        for length, words in sorted(words_by_length.items()):
+            if length in self.loaded_lengths:
+                continue
+            char_size, data = encode_words(words)
+            self.words_by_length[length] = WordBlock(data, 0, len(words), length, char_size)
+            kept += len(words)
+            store_size += len(data)
+        
+        self.load_log.append(f"Loaded {kept} distinct words of {word_count} in {time.time() - start:.2f} seconds "
+                             f"({store_size / 2**20:.1f} MB word store, {duplicates} duplicates dropped)")
+        if skipped:
+            # What a list of str would have cost: object header plus one byte per ASCII letter, plus the pointer
+            skipped_size = (skipped * (sys.getsizeof('') + 8) + skipped_chars) / 2**20
+            self.load_log.append(f"Skipped {skipped} words of lengths without slots "
+                                 f"(~{skipped_size:.1f} MB as Python strings)")
+        for length in sorted(words_by_length):
+            self.load_log.append(f"  Length {length}: {len(self.words_by_length[length])} words")
+
+    def load_compiled(self):
+        """Map the compiled dictionary into memory if it matches the wordlist.
+        
+        Returns False when there is no compiled dictionary or it is stale.
+        """
+        if not os.path.exists(self.dict_file):
+            return False
+        
+        with open(self.dict_file, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, digest, mtime, size, word_count, block_count = DICT_HEADER.unpack_from(buffer, 0)
+        
+        # The mtime and size are a cheap check; only hash the wordlist when they differ
+        stat = os.stat(self.words_file)
+        if magic != DICT_MAGIC or size != stat.st_size or (
+                mtime != stat.st_mtime and digest != wordlist_digest(self.words_file)):
+            buffer.close()
+            self.load_log.append(f"Compiled dictionary {self.dict_file} is stale, ignoring it")
+            return False
+        
+        for i in range(block_count):
+            length, char_size, count, offset = DICT_ENTRY.unpack_from(buffer, DICT_HEADER.size + i * DICT_ENTRY.size)
+            self.words_by_length[length] = WordBlock(buffer, offset, count, length, char_size)
+        self.buffer = buffer
+        self.digest = digest
+        
+        self.load_log.append(f"Loaded {word_count} words from compiled dictionary {self.dict_file}")
+        for length, words in sorted(self.words_by_length.items()):
+            self.load_log.append(f"  Length {length}: {len(words)} words")
+        return True
+
+    def wordlist_digest(self):
+        """SHA-256 of the wordlist, hashed on first use unless the compiled dictionary had it."""
+        if self.digest is None:
+            self.digest = wordlist_digest(self.words_file)
+        return self.digest
+
+    def index(self, length):
+        """Letter index of the words of a length, built on first use."""
+        if length not in self.indexes:
+            self.indexes[length] = INDEX_BACKENDS[self.backend](self.words_by_length.get(length, []), length)
+        return self.indexes[length]
+
+
+class CheckpointError(Exception):
+    """Raised when a checkpoint cannot be read or does not belong to the search resuming it."""
+
+
+class SearchStopped(Exception):
+    """Raised inside the search to abandon it, e.g. when another worker already won."""
+
+
+class BudgetExhausted(SearchStopped):
+    """Raised when the time or node budget of the solve has run out."""
+
+
+class RestartCutoff(SearchStopped):
+    """Raised when the current restart has used up its node cutoff."""
+
+
+def _portfolio_worker(solver, worker_id, config, overlaps, slots, conn, stop_event):
+    """Run one portfolio configuration in a forked process and report the outcome."""
+    solver.configure_search(**config)
+    solver.stop_event = stop_event
+    try:
+        solution = solver.run_search(overlaps, slots)
+        conn.send(('solved' if solution else 'exhausted', solver.stats.counters(), solution))
+    except BudgetExhausted:
+        conn.send(('budget', solver.stats.counters(), None))
+    except SearchStopped:
+        conn.send(('cancelled', solver.stats.counters(), None))
+    finally:
+        conn.close()
+
+
+# Solver and overlaps shared with the component pool processes (inherited via fork)
+_component_search = None
+
+
+def _component_worker(task):
+    """Pool entry point: search one component with the solver inherited from the parent."""
+    number, slots = task
+    solver, overlaps = _component_search
+    solver.stats.reset()
+    try:
+        solution = solver.run_search(overlaps, slots)
+        return number, ('solved' if solution else 'exhausted'), solver.stats.counters(), solution
+    except BudgetExhausted:
+        return number, 'budget', solver.stats.counters(), None
+
+
+class SearchStats:
+    """Counters, heuristic timings and event hooks of a search.
+    
+    The search increments the counters directly. Hooks are callables
+    registered per event with add_hook and are only called when present:
+    on_assign(slot, word, depth), on_backtrack(slot, depth),
+    on_wipeout(slot, wiped_slot) and on_progress(line).
+    """
+    COUNTERS = ('nodes', 'backtracks', 'backjumps', 'consistency_checks', 'forward_checks',
+                'wipeouts', 'nogood_hits', 'restarts', 'cache_hits')
+    EVENTS = ('on_assign', 'on_backtrack', 'on_wipeout', 'on_progress')
+    
+    def __init__(self, progress_interval=PROGRESS_INTERVAL):
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        self.max_depth = 0  # Deepest assignment size reached
+        self.heuristic_time = defaultdict(float)  # Maps heuristic names to seconds spent in them
+        self.progress_interval = progress_interval
+        self.next_progress = float('inf')  # Time of the next progress line, set when the search starts
+        for event in self.EVENTS:
+            setattr(self, event, [])
+    
+    def reset(self):
+        """Zero the counters and timings, keeping the hooks."""
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        self.max_depth = 0
+        self.heuristic_time.clear()
+    
+    def add_hook(self, event, hook):
+        """Call hook on every occurrence of event (one of EVENTS)."""
+        if event not in self.EVENTS:
+            raise ValueError(f"Unknown search event '{event}'")
+        getattr(self, event).append(hook)
+    
+    def counters(self):
+        """Counters as a picklable dict, e.g. to report them from a portfolio worker."""
+        counters = {name: getattr(self, name) for name in self.COUNTERS}
+        counters['max_depth'] = self.max_depth
+        counters['heuristic_time'] = dict(self.heuristic_time)
+        return counters
+    
+    def merge(self, counters):
+        """Add the counters of another search (see counters)."""
+        for name in self.COUNTERS:
+            setattr(self, name, getattr(self, name) + counters.get(name, 0))
+        self.max_depth = max(self.max_depth, counters.get('max_depth', 0))
+        for name, seconds in counters.get('heuristic_time', {}).items():
+            self.heuristic_time[name] += seconds
+
+
+class NogoodStore:
+    """Bounded store of letter-pattern nogoods with least-recently-used eviction.
+    
+    A nogood is a frozenset of (cell, letter) pairs that cannot all hold in a
+    solution. As with watched literals in SAT solvers, each nogood watches two
+    of its pairs that do not hold yet (while it has two), so only a slot that
+    covers a watched cell can complete it, and a watch whose partner still does
+    not hold rules the nogood out at once. Watches move when a placed letter
+    makes them hold and need no change when the search backtracks.
+    """
+    __slots__ = ('limit', 'nogoods', 'watchers')
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.nogoods = OrderedDict()  # Maps nogoods, least recently used first, to their two watched pairs
+        self.watchers = defaultdict(set)  # Maps cells to the nogoods watching them
+
+    def __len__(self):
+        return len(self.nogoods)
+
+    def add(self, nogood, watches):
+        """Store a nogood with its watched pairs, evicting the least recently used one when full."""
+        if nogood in self.nogoods:
+            self.nogoods.move_to_end(nogood)
+            return
+        self.nogoods[nogood] = list(watches)
+        for cell, _ in watches:
+            self.watchers[cell].add(nogood)
+        if len(self.nogoods) > self.limit:
+            evicted, evicted_watches = self.nogoods.popitem(last=False)
+            for cell, _ in evicted_watches:
+                self.unwatch(evicted, cell)
+
+    def unwatch(self, nogood, cell):
+        """Remove a nogood from the watchers of a cell."""
+        bucket = self.watchers.get(cell)
+        if bucket is not None:
+            bucket.discard(nogood)
+            if not bucket:
+                del self.watchers[cell]
+
+    def patterns(self, cells, cell_letters):
+        """Letter patterns on cells that would complete a stored nogood.
+        
+        Returns (pattern, nogood) pairs, where pattern is a tuple of (cell, letter)
+        on cells and every other pair of the nogood already holds in cell_letters.
+        The pairs come in a canonical order, so the nogood that rules out a value
+        does not depend on set iteration order (string hashing, insertion history).
+        """
+        cells = set(cells)
+        found = {}
+        for cell in cells:
+            for nogood in self.watchers.get(cell, ()):
+                if nogood in found:
+                    continue
+                # A watched pair outside cells that does not hold rules the nogood out
+                if any(other_cell not in cells and cell_letters.get(other_cell) != letter
+                       for other_cell, letter in self.nogoods[nogood]):
+                    continue
+                if all(cell_letters.get(other_cell) == letter for other_cell, letter in nogood if other_cell not in cells):
+                    found[nogood] = tuple(pair for pair in nogood if pair[0] in cells)
+        patterns = [(pattern, nogood) for nogood, pattern in found.items()]
+        if len(patterns) > 1:
+            patterns.sort(key=lambda item: sorted(item[1]))
+        return patterns
+
+    def placed(self, letters, cell_letters):
+        """Move the watches made to hold by letters just placed (already in cell_letters)."""
+        for cell, letter in letters.items():
+            for nogood in list(self.watchers.get(cell, ())):
+                watches = self.nogoods[nogood]
+                i = 0 if watches[0][0] == cell else 1
+                if watches[i][1] != letter:
+                    continue
+                # Watch another pair that does not hold; keep the watch if there is none
+                other = watches[1 - i] if len(watches) > 1 else None  # Single-pair nogoods watch one pair
+                for pair in nogood:
+                    if pair != other and cell_letters.get(pair[0]) != pair[1]:
+                        if other is None or other[0] != cell:
+                            self.unwatch(nogood, cell)
+                        watches[i] = pair
+                        self.watchers[pair[0]].add(nogood)
+                        break
+
+    def touch(self, nogood):
+        """Mark a nogood as recently used (it may have been evicted since it was matched)."""
+        if nogood in self.nogoods:
+            self.nogoods.move_to_end(nogood)
+
+
+class SlotQueue:
+    """Priority queue of unassigned slots for variable selection.
+    
+    Each slot has a key (lower is better). Entries are never updated in place:
+    a slot whose key changes gets a new heap entry, and entries that no longer
+    match the slot's current key are discarded when they reach the top.
+    """
+    __slots__ = ('heap', 'keys')
+
+    def __init__(self):
+        self.heap = []
+        self.keys = {}  # Current key of every slot in the queue
+
+    def __len__(self):
+        return len(self.keys)
+
+    def update(self, slot, key):
+        """Add a slot or change its key."""
+        if self.keys.get(slot) != key:
+            self.keys[slot] = key
+            heapq.heappush(self.heap, (key, slot))
+
+    def remove(self, slot):
+        """Remove a slot; its heap entries become stale."""
+        del self.keys[slot]
+
+    def best(self):
+        """Slot with the lowest key, or None if the queue is empty."""
+        heap = self.heap
+        keys = self.keys
+        # Compact the heap when stale entries dominate it
+        if len(heap) > 4 * len(keys) + 64:
+            heap[:] = [(key, slot) for slot, key in keys.items()]
+            heapq.heapify(heap)
+        while heap:
+            key, slot = heap[0]
+            if keys.get(slot) == key:
+                return slot
+            heapq.heappop(heap)
+        return None
+
+
+class SearchLevel:
+    """One level of the explicit search stack.
+    
+    Holds the slot chosen at this depth, its values in LCV order, the cursor of
+    the next value to try and the trail mark taken when the current value was
+    assigned (None while no value is assigned). CBJ levels also keep their
+    conflict set, the nogood patterns on their crossing cells and the cells
+    whose letters the current value placed.
+    """
+    __slots__ = ('slot', 'values', 'cursor', 'mark', 'conflict', 'patterns', 'placed')
+
+    def __init__(self, slot, values):
+        self.slot = slot
+        self.values = values
+        self.cursor = 0
+        self.mark = None
+        self.conflict = None
+        self.patterns = None
+        self.placed = None
+
+
+class CountLevel:
+    """One level of the solution counting stack (see CrosswordCSP.count_search).
+    
+    Counts the solutions of a component of unassigned slots, identified by key
+    in the count cache, by branching on one of its slots: values are the words
+    of the slot, cursor the next one to try and total the solutions counted so
+    far. While a value is assigned, parts are the components the other slots
+    fall into, part the next one to count and product the product of the
+    counts of the parts before it.
+    """
+    __slots__ = ('key', 'slots', 'slot', 'values', 'cursor', 'mark', 'total', 'parts', 'part', 'product')
+
+    def __init__(self, key, slots, slot, values):
+        self.key = key
+        self.slots = slots
+        self.slot = slot
+        self.values = values
+        self.cursor = 0
+        self.mark = None
+        self.total = 0
+        self.parts = None
+        self.part = 0
+        self.product = 1
+
 
 class CrosswordCSP:
-    def __init__(self, grid_file, words_file):
-        """Initialize the CSP with grid and words."""
+    def __init__(self, grid_file, words_file, dict_file=None, propagation='fc', seed=None, workers=1,
+                 dictionary=None, search='backtrack', time_limit=None, node_limit=None, restarts=None,
+                 profile=False, backend='bitset', checkpoint_file=None, checkpoint_every=CHECKPOINT_INTERVAL,
+                 resume_file=None, distinct_words=False):
+        """Initialize the CSP with grid and words.
+        
+        propagation is 'fc' (forward checking) or 'mac' (maintain arc
+        consistency after every assignment). search is 'backtrack'
+        (chronological) or 'cbj' (conflict-directed backjumping with nogoods). A seed randomizes the tie-breaks
+        of variable and value ordering; workers > 1 runs a portfolio of
+        differently configured searches in parallel processes. A WordDictionary
+        can be passed to share already loaded words between solvers.
+        time_limit (seconds) and node_limit bound the search; restarts='luby'
+        restarts it with new tie-breaks after a growing number of nodes.
+        profile=True makes run() profile the solve with cProfile. backend
+        selects how domains are stored ('bitset' or 'numpy', see INDEX_BACKENDS).
+        A single-process search writes its state to checkpoint_file every
+        checkpoint_every seconds and when its budget runs out; resume_file
+        continues the search saved in such a checkpoint. distinct_words=True
+        forbids using the same word in more than one slot.
+        """
         self.grid_file = grid_file
         self.words_file = words_file
+        self.dictionary = dictionary or WordDictionary(words_file, dict_file, backend)
+        self.propagation = propagation
+        self.search = search
+        self.seed = seed
+        self.workers = workers
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.restarts = restarts
+        self.distinct_words = distinct_words
+        self.deadline = None  # Time at which the search gives up, from time_limit
+        self.node_cutoff = None  # Node count at which the current run stops, from node_limit and restarts
+        self.status = None  # 'solved', 'unsatisfiable' or 'budget' once solve has run
+        self.value_salt = None  # Random tie-break salt for value ordering, set from the seed
+        self.stop_event = None  # Set by the portfolio when another worker has won
+        self.next_stop_check = 0.0  # Time of the next check of stop_event
         self.grid = []
-        self.words_by_length = defaultdict(list)  # Dictionary of words by length for faster lookup
-        self.slots = []  # List of horizontal and vertical slots for words
+        self.words_by_length = self.dictionary.words_by_length  # Dictionary of words by length for faster lookup
+        self.slots = []  # List of horizontal and vertical slots for words; the search uses their ids in this list
         self.assignment = {}  # Maps slots to assigned words
-        self.domain = {}  # Maps slots to possible words
+        self.word_index = {}  # Maps word lengths to their WordIndex (or NumpyWordIndex)
+        self.slot_index = []  # Word index of every slot id
+        self.domain = []  # Bitset (or numpy mask) of possible word ids for every slot id
+        self.histograms = []  # Per slot id, (domain, letter counts) of every position for LCV
         self.solution_log = []  # Log for recording solution steps
         self.start_time = None
         self.elapsed_time = 0
+        self.stats = SearchStats()  # Search counters, timings and hooks
+        self.profile = profile
+        self.peak_rss = 0  # Peak resident memory in MB, measured after the search
+        self.explanations = []  # Per slot id, the crossing cells whose letters reduced its domain
+        self.wipeout_explanation = frozenset()  # Crossing cells responsible for the last wipeout
+        self.nogoods = NogoodStore(NOGOOD_LIMIT)
+        self.crossing_cells = []  # Per slot id, (position, cell id) for cells shared with another slot
+        self.cell_letters = {}  # Letters placed on crossing cells by the current assignment
+        self.cell_owner = {}  # Maps lettered crossing cells to the slot id that placed the letter
+        self.cell_count = 0  # Number of cell ids; CBJ conflicts name the word of slot id s as cell cell_count + s
+        self.word_owner = {}  # With distinct words, maps the assigned words to their slot ids
+        self.assign_depth = []  # Depth in the search of every assigned slot id
+        self.slot_order = []  # Tie-breaking rank of every slot id, the last key of the slot queue
+        self.unassigned_degree = []  # Number of unassigned neighbours of every slot id
+        self.search_stack = []  # SearchLevels of the running search, outermost first
+        self.component_number = 1  # Connected component being searched, counted from 1 in search order
+        self.solved_components = {}  # Maps the slot ids of the components already solved to their words
+        self.restart_rng = None  # Draws the seed of every restart of the running search
+        self.restart_cutoff = None  # Node count at which the running restart ends, before the node limit
+        self.checkpoint_file = checkpoint_file
+        self.checkpoint_every = checkpoint_every
+        self.next_checkpoint = float('inf')  # Time of the next periodic checkpoint
+        self.resume_file = resume_file
+        self.resume_levels = None  # (slot, cursor, conflict, patterns) records the search replays when resuming
+        self.resume_nogoods = []  # Nogoods of a checkpoint with their watched pairs first, added after the replay
+        self.solution_count = None  # Solutions found by iter_solutions or counted by count_solutions
         
-    def load_grid(self):
-        """Load the grid from the input file."""
+    def load_grid(self, text=None):
+        """Load the grid from the input file, or from text when given (grid_file then only names it)."""
+        if text is not None:
+            self.grid.extend(line.strip() for line in text.splitlines())
+            return
         with open(self.grid_file, 'r') as f:
             for line in f:
                 self.grid.append(line.strip())
         
     def load_words(self):
-        """Load the words from the input file, organizes them by length."""
-        word_count = 0
-        with open(self.words_file, 'r') as f:
-            for line in f:
-                word = line.strip().upper()
-                if word:  # Skip empty lines
-                    self.words_by_length[len(word)].append(word)
-                    word_count += 1
-                    # Print progress for very large files
-                    if word_count % 100000 == 0:
-                        print(f"Loaded {word_count} words...")
-        
-        self.solution_log.append(f"Loaded {word_count} words grouped by length")
-        for length, words in sorted(self.words_by_length.items()):
-            self.solution_log.append(f"  Length {length}: {len(words)} words")
+        """Load the words of the slot lengths through the dictionary.
+        
+        Call identify_slots first so that only the lengths the grid uses are
+        loaded; without slots every length is.
+        """
+        self.dictionary.load({slot[3] for slot in self.slots} or None)
+        self.solution_log.extend(self.dictionary.load_log)
+    
+    def is_open(self, i, j):
+        """Whether cell (i, j) belongs to words: empty ('?') or pre-filled with a letter."""
+        if j >= len(self.grid[i]):
+            return False
+        cell = self.grid[i][j]
+        return cell == '?' or cell.isalpha()
     
     def identify_slots(self):
-        """Identify horizontal and vertical slots in the grid."""
+        """Identify horizontal and vertical slots in the grid, pre-filled cells included."""
         height = len(self.grid)
         width = len(self.grid[0])
         
@@ -50,9 +880,9 @@ class CrosswordCSP:
         for i in range(height):
             j = 0
             while j < width:
-                if j < len(self.grid[i]) and self.grid[i][j] == '?':
+                if self.is_open(i, j):
                     start = j
-                    while j < width and j < len(self.grid[i]) and self.grid[i][j] == '?':
+                    while j < width and self.is_open(i, j):
                         j += 1
                     end = j
                     if end - start > 1:  # Consider slots with at least 2 cells
@@ -64,9 +894,9 @@ class CrosswordCSP:
         for j in range(width):
             i = 0
             while i < height:
-                if i < height and j < len(self.grid[i]) and self.grid[i][j] == '?':
+                if self.is_open(i, j):
                     start = i
-                    while i < height and j < len(self.grid[i]) and self.grid[i][j] == '?':
+                    while i < height and self.is_open(i, j):
                         i += 1
                     end = i
                     if end - start > 1:  # Consider slots with at least 2 cells
@@ -74,187 +904,1318 @@ class CrosswordCSP:
                 else:
                     i += 1
     
+    def build_word_index(self):
+        """Build the positional letter index for every slot length in the grid."""
+        index_start = time.time()
+        for length in sorted({slot[3] for slot in self.slots}):
+            self.word_index[length] = self.dictionary.index(length)
+        self.solution_log.append(f"Built letter index for lengths {sorted(self.word_index)} "
+                                 f"in {time.time() - index_start:.2f} seconds")
+    
     def initialize_domains(self):
-        """Initialize domains for each slot."""
-        for slot in self.slots:
-            direction, row, col, length = slot
-            # Use pre-filtered words matching the slot length
-            if length in self.words_by_length:
-                self.domain[slot] = list(self.words_by_length[length])
-            else:
-                self.domain[slot] = []
+        """Initialize domains for each slot.
+        
+        Every word of the slot length is a candidate, except that letters
+        pre-filled in the grid keep only the words with those letters, one index
+        lookup and AND per letter.
+        """
+        self.build_word_index()
+        self.slot_index = [self.word_index[slot[3]] for slot in self.slots]
+        self.domain = []
+        fixed_cells = set()
+        words_before = words_after = 0
+        for slot, index in zip(self.slots, self.slot_index):
+            length = slot[3]
+            domain = index.full
+            if not index.count(domain):
                 self.solution_log.append(f"Warning: No words of length {length} in the dictionary")
+            
+            fixed = self.fixed_letters(slot)
+            if fixed:
+                words_before += index.count(domain)
+                for pos, cell, letter in fixed:
+                    domain = domain & index.matching(pos, letter)
+                    fixed_cells.add(cell)
+                words_after += index.count(domain)
+                if not index.count(domain):
+                    pattern = ''.join(self.grid[r][c].upper() if self.grid[r][c] != '?' else '?'
+                                      for r, c in self.slot_cells(slot))
+                    self.solution_log.append(f"Warning: No word matches the pre-filled letters {pattern} "
+                                             f"of slot {slot}")
+            self.domain.append(domain)
+        
+        if fixed_cells:
+            self.solution_log.append(f"Pre-filled letters in {len(fixed_cells)} cells cut the domains of their "
+                                     f"slots from {words_before} to {words_after} candidate words")
     
-    def forward_check(self, slot, word, assignment, domain, overlaps):
-        """Apply forward checking to reduce domains of unassigned variables."""
-        reduced_domains = {}
+    def fixed_letters(self, slot):
+        """(position, cell, letter) of every cell of slot pre-filled in the grid."""
+        fixed = []
+        for pos, (row, col) in enumerate(self.slot_cells(slot)):
+            cell = self.grid[row][col]
+            if cell != '?':
+                fixed.append((pos, (row, col), cell.upper()))
+        return fixed
+    
+    def domain_size(self, slot, domain):
+        """Number of words left in the domain of a slot id."""
+        return self.slot_index[slot].count(domain[slot])
+    
+    def forward_check(self, slot, word, assignment, domain, overlaps, trail):
+        """Apply forward checking to reduce domains of unassigned variables.
         
-        for other_slot in overlaps[slot]:
+        Domains are reduced in place and each replaced domain is pushed on the
+        trail so it can be restored by undo_domains. Every reduction adds the
+        crossing cell to the explanation of the reduced domain. Returns False on
+        a wipeout, with the cells responsible for it in self.wipeout_explanation.
+        """
+        explanations = self.explanations
+        slot_index = self.slot_index
+        stats = self.stats
+        stats.forward_checks += 1
+        for other_slot, pos1, pos2, cell in overlaps[slot]:
             if other_slot not in assignment:
-                pos1, pos2 = overlaps[slot][other_slot]
+                index = slot_index[other_slot]
                 
-                # Check constraint and reduce domain
-                if pos1 < len(word):
-                    char_at_overlap = word[pos1]
-                    new_domain = [w for w in domain[other_slot] if pos2 < len(w) and w[pos2] == char_at_overlap]
-                    
-                    if not new_domain:  # Domain wipeout
-                        return None
-                    
-                    if len(new_domain) < len(domain[other_slot]):
-                        reduced_domains[other_slot] = new_domain
+                # Keep only the words with the same letter at the overlap
+                new_domain = domain[other_slot] & index.matching(pos2, word[pos1])
+                new_size = index.count(new_domain)
+                
+                if not new_size:  # Domain wipeout
+                    stats.wipeouts += 1
+                    for hook in stats.on_wipeout:
+                        hook(self.slots[slot], self.slots[other_slot])
+                    self.wipeout_explanation = explanations[other_slot] | {cell}
+                    return False
+                
+                if new_size < index.count(domain[other_slot]):
+                    trail.append((other_slot, domain[other_slot], explanations[other_slot]))
+                    domain[other_slot] = new_domain
+                    explanations[other_slot] = explanations[other_slot] | {cell}
         
-        return reduced_domains
+        return True
     
-    def get_overlaps(self):
-        """Find overlapping positions between slots."""
-        overlaps = {}
-        for slot1 in self.slots:
-            overlaps[slot1] = {}
-            dir1, row1, col1, len1 = slot1
+    def arc_consistency(self, arcs, assignment, domain, overlaps, trail):
+        """AC-3 over the unassigned slots, starting from the given arcs.
+        
+        An arc is (slot, other_slot, pos1, pos2) with the crossing positions in
+        both slots. Revising it removes the words of slot whose letter at pos1 no
+        longer appears at pos2 in the domain of other_slot; both sides are read
+        from letter histograms. Changes are pushed on the trail like in
+        forward_check, and the explanation of the revised domain absorbs the one
+        of other_slot. Returns False on a domain wipeout.
+        """
+        explanations = self.explanations
+        slot_count = len(self.slots)
+        queue = deque(arcs)
+        pending = {slot * slot_count + other_slot for slot, other_slot, _, _ in arcs}  # Queued arcs as ints
+        while queue:
+            slot, other_slot, pos1, pos2 = queue.popleft()
+            pending.discard(slot * slot_count + other_slot)
             
-            for slot2 in self.slots:
-                if slot1 != slot2:
-                    dir2, row2, col2, len2 = slot2
-                    
-                    if dir1 != dir2:  # Different directions can overlap
-                        if dir1 == 'H':  # slot1 is horizontal, slot2 is vertical
-                            if col1 <= col2 < col1 + len1 and row2 <= row1 < row2 + len2:
-                                # Calculate relative positions in each word
-                                pos1 = col2 - col1
-                                pos2 = row1 - row2
-                                overlaps[slot1][slot2] = (pos1, pos2)
-                        else:  # slot1 is vertical, slot2 is horizontal
-                            if col2 <= col1 < col2 + len2 and row1 <= row2 < row1 + len1:
-                                # Calculate relative positions in each word
-                                pos1 = row2 - row1
-                                pos2 = col1 - col2
-                                overlaps[slot1][slot2] = (pos1, pos2)
+            # Letters at the overlap with no support in the other slot
+            supported = self.letter_histogram(other_slot, pos2, domain)
+            unsupported = [letter for letter in self.letter_histogram(slot, pos1, domain) if letter not in supported]
+            if not unsupported:
+                continue
+            
+            index = self.slot_index[slot]
+            new_domain = domain[slot]
+            for letter in unsupported:
+                new_domain = new_domain & ~index.matching(pos1, letter)
+            if not index.count(new_domain):  # Domain wipeout
+                self.stats.wipeouts += 1
+                for hook in self.stats.on_wipeout:
+                    hook(self.slots[other_slot], self.slots[slot])
+                self.wipeout_explanation = explanations[slot] | explanations[other_slot]
+                return False
+            
+            trail.append((slot, domain[slot], explanations[slot]))
+            domain[slot] = new_domain
+            explanations[slot] = explanations[slot] | explanations[other_slot]
+            
+            # Slots that relied on the removed words must be revised again
+            for neighbour, pos, neighbour_pos, _ in overlaps[slot]:
+                arc = neighbour * slot_count + slot
+                if neighbour != other_slot and neighbour not in assignment and arc not in pending:
+                    queue.append((neighbour, slot, neighbour_pos, pos))
+                    pending.add(arc)
+        return True
+    
+    def propagate(self, slot, word, assignment, domain, overlaps, trail):
+        """Propagate the assignment of word to slot using the configured mode.
+        
+        Returns False if a domain was wiped out.
+        """
+        mark = len(trail)
+        if not self.forward_check(slot, word, assignment, domain, overlaps, trail):
+            return False
+        if self.propagation != 'mac':
+            return True
         
+        # Restore arc consistency around the slots forward checking reduced
+        arcs = []
+        for changed_slot in {entry[0] for entry in trail[mark:]}:
+            for neighbour, pos, neighbour_pos, _ in overlaps[changed_slot]:
+                if neighbour not in assignment:
+                    arcs.append((neighbour, changed_slot, neighbour_pos, pos))
+        return self.arc_consistency(arcs, assignment, domain, overlaps, trail)
+    
+    def undo_domains(self, domain, trail, mark):
+        """Restore the domains (and explanations) changed since the trail had length mark."""
+        explanations = self.explanations
+        while len(trail) > mark:
+            slot, old_domain, old_explanation = trail.pop()
+            domain[slot] = old_domain
+            explanations[slot] = old_explanation
+    
+    def get_overlaps(self):
+        """Find the crossings of every slot in one pass over the cells of the slots.
+        
+        Slots are identified by their position in self.slots and cells by
+        row * width + col. The cells of the horizontal slots are recorded first,
+        so each cell of a vertical slot finds the slot crossing it with a single
+        lookup. Returns a list with, for every slot id, the (other slot id,
+        position in the slot, position in the other slot, cell id) of each
+        crossing.
+        """
+        width = len(self.grid[0])
+        across = [None] * (len(self.grid) * width)  # Maps cell ids to (horizontal slot id, position)
+        overlaps = [[] for _ in self.slots]
+        for slot_id, slot in enumerate(self.slots):
+            if slot[0] == 'H':
+                for pos, (row, col) in enumerate(self.slot_cells(slot)):
+                    across[row * width + col] = (slot_id, pos)
+        for slot_id, slot in enumerate(self.slots):
+            if slot[0] == 'V':
+                for pos, (row, col) in enumerate(self.slot_cells(slot)):
+                    cell = row * width + col
+                    if across[cell] is not None:
+                        other_id, other_pos = across[cell]
+                        overlaps[other_id].append((slot_id, other_pos, pos, cell))
+                        overlaps[slot_id].append((other_id, pos, other_pos, cell))
         return overlaps
     
     def check_consistent(self, slot, word, assignment, overlaps):
-        """Check if assigning word to slot is consistent with current assignment."""
-        for other_slot in overlaps[slot]:
+        """Check if assigning word to slot is consistent with current assignment.
+        
+        With distinct words, a word already assigned to another slot is not.
+        """
+        self.stats.consistency_checks += 1
+        if word in self.word_owner:
+            return False
+        for other_slot, pos1, pos2, _ in overlaps[slot]:
             if other_slot in assignment:
-                pos1, pos2 = overlaps[slot][other_slot]
                 if pos1 < len(word) and pos2 < len(assignment[other_slot]):
                     if word[pos1] != assignment[other_slot][pos2]:
                         return False
         return True
     
-    def mrv_heuristic(self, unassigned_slots, domain):
-        """Minimum Remaining Values heuristic: choose slot with fewest legal values."""
-        return min(unassigned_slots, key=lambda slot: len(domain[slot]))
+    def mrv_heuristic(self, slot, domain):
+        """Minimum Remaining Values heuristic: the number of legal values of slot (fewer first)."""
+        return self.domain_size(slot, domain)
     
-    def degree_heuristic(self, unassigned_slots, overlaps):
-        """Degree heuristic: choose slot with most constraints on other variables."""
-        return max(unassigned_slots, key=lambda slot: sum(1 for other_slot in overlaps[slot] if other_slot in unassigned_slots))
+    def degree_heuristic(self, slot):
+        """Degree heuristic: the number of unassigned slots crossing slot (more first)."""
+        return self.unassigned_degree[slot]
     
-    def combined_heuristic(self, unassigned_slots, domain, overlaps):
-        """Combined MRV and degree heuristic."""
-        # Calculate MRV score (lower is better)
-        mrv_scores = {slot: len(domain[slot]) for slot in unassigned_slots}
-        min_domain_size = min(mrv_scores.values())
-        
-        # Filter slots with minimum domain size
-        min_domain_slots = [slot for slot in unassigned_slots if mrv_scores[slot] == min_domain_size]
+    def slot_key(self, slot, domain):
+        """Combined MRV and degree key: fewest values first, then most unassigned neighbours."""
+        return (self.mrv_heuristic(slot, domain), -self.degree_heuristic(slot), self.slot_order[slot])
+    
+    def combined_heuristic(self, queue):
+        """Combined MRV and degree heuristic, read from the slot queue."""
+        start = time.perf_counter()
+        slot = queue.best()
+        self.stats.heuristic_time['combined'] += time.perf_counter() - start
+        return slot
+    
+    def assign_slot(self, slot, word, assignment, queue, overlaps):
+        """Record an assignment and update the unassigned degree of its neighbours (and the queue, if any)."""
+        assignment[slot] = word
+        if queue is not None:
+            queue.remove(slot)
+        if self.distinct_words:
+            self.word_owner[word] = slot
+        unassigned_degree = self.unassigned_degree
+        for other_slot, _, _, _ in overlaps[slot]:
+            unassigned_degree[other_slot] -= 1
+        for hook in self.stats.on_assign:
+            hook(self.slots[slot], word, len(assignment))
+    
+    def unassign_slot(self, slot, assignment, overlaps):
+        """Undo assign_slot; the caller refreshes the affected queue keys."""
+        if self.distinct_words:
+            del self.word_owner[assignment[slot]]
+        del assignment[slot]
+        unassigned_degree = self.unassigned_degree
+        for other_slot, _, _, _ in overlaps[slot]:
+            unassigned_degree[other_slot] += 1
+    
+    def touched_slots(self, slot, trail, mark, overlaps):
+        """Slots whose queue key may change when slot is assigned or unassigned."""
+        touched = {entry[0] for entry in trail[mark:]}
+        touched.add(slot)
+        touched.update(crossing[0] for crossing in overlaps[slot])
+        return touched
+    
+    def refresh_keys(self, slots, assignment, domain, queue):
+        """Recompute the queue keys of the unassigned slots among slots."""
+        for slot in slots:
+            if slot not in assignment:
+                queue.update(slot, self.slot_key(slot, domain))
+    
+    def letter_histogram(self, slot, pos, domain):
+        """Count the words in the domain of slot by their letter at pos.
         
-        if len(min_domain_slots) == 1:
-            return min_domain_slots[0]
+        Histograms are cached per slot and position together with the domain they
+        were computed from, so they are only recomputed after the domain changes.
+        """
+        cache = self.histograms[slot]
+        cached = cache[pos]
+        if cached is not None and cached[0] is domain[slot]:
+            return cached[1]
         
-        # Use degree heuristic as tie-breaker
-        return self.degree_heuristic(min_domain_slots, overlaps)
+        bits = domain[slot]
+        histogram = self.slot_index[slot].histogram(bits, pos)
+        cache[pos] = (bits, histogram)
+        return histogram
     
     def lcv_heuristic(self, slot, domain, assignment, overlaps):
-        """Least Constraining Value heuristic: sort domain values by how much they constrain others."""
-        def count_conflicts(word):
-            count = 0
-            for other_slot in overlaps[slot]:
-                if other_slot not in assignment:
-                    pos1, pos2 = overlaps[slot][other_slot]
-                    if pos1 < len(word):
-                        char_at_overlap = word[pos1]
-                        for other_word in domain[other_slot]:
-                            if pos2 < len(other_word) and other_word[pos2] != char_at_overlap:
-                                count += 1
-            return count
-        
-        # For large domains, sample a subset to speed up sorting
-        if len(domain[slot]) > 500:
-            sample_size = min(200, len(domain[slot]))
-            sampled_domain = random.sample(domain[slot], sample_size)
-            return sorted(sampled_domain, key=count_conflicts) + [w for w in domain[slot] if w not in sampled_domain]
-        else:
-            return sorted(domain[slot], key=count_conflicts)
-    
-    def backtrack(self, assignment, domain, overlaps):
-        """Backtracking search with heuristics."""
-        if len(assignment) % 5 == 0 and len(assignment) > 0:
-            current_time = time.time()
-            elapsed = current_time - self.start_time
-            self.solution_log.append(f"Current assignment size: {len(assignment)}/{len(self.slots)} in {elapsed:.2f} seconds")
+        """Least Constraining Value heuristic: sort domain values by how much they constrain others.
         
-        if len(assignment) == len(self.slots):
-            return assignment
+        The conflicts a word causes in a neighbour are the neighbour's words with a
+        different letter at the overlap, read from the neighbour's letter histogram.
+        """
+        start = time.perf_counter()
         
-        unassigned_slots = [slot for slot in self.slots if slot not in assignment]
+        # (position in this slot, conflicts per letter, conflicts for any other letter)
+        neighbour_conflicts = []
+        for other_slot, pos1, pos2, _ in overlaps[slot]:
+            if other_slot not in assignment:
+                histogram = self.letter_histogram(other_slot, pos2, domain)
+                size = sum(histogram.values())
+                conflicts = {letter: size - count for letter, count in histogram.items()}
+                neighbour_conflicts.append((pos1, conflicts, size))
         
-        # Use combined heuristic to select the next slot
-        slot = self.combined_heuristic(unassigned_slots, domain, overlaps)
+        index = self.slot_index[slot]
+        ordered = index.order_by_conflicts(domain[slot], neighbour_conflicts, self.value_salt)
+        self.stats.heuristic_time['lcv'] += time.perf_counter() - start
+        return ordered
+    
+    def backtrack(self, assignment, domain, overlaps, trail, queue):
+        """Backtracking search with heuristics; returns the first solution or None."""
+        return next(self.backtrack_solutions(assignment, domain, overlaps, trail, queue), None)
+    
+    def backtrack_solutions(self, assignment, domain, overlaps, trail, queue):
+        """Backtracking search with heuristics, on an explicit stack of SearchLevels.
+        
+        Domains are changed in place; every change is recorded on the trail and
+        rolled back when the search backtracks. The queue holds the unassigned
+        slots being searched and only the keys of slots touched by an assignment
+        are updated; a solution is found when it is empty. Each level keeps its
+        slot, its values in LCV order and the cursor of the next one to try, so
+        the depth of the search is not bounded by the recursion limit.
+        
+        This is a generator: it yields the assignment (which it goes on to
+        change) at every solution and, when resumed, carries on as if the
+        solution had failed, until the search space is exhausted.
+        """
+        stack = self.search_stack = []
+        if self.resume_levels is not None:
+            self.replay_levels(assignment, domain, overlaps, trail, queue)
+        descend = True
+        while True:
+            if descend:
+                self.enter_node(assignment)
+                if not queue:
+                    yield assignment
+                    if not stack:
+                        return
+                    descend = False
+                else:
+                    # Use combined heuristic to select the next slot, LCV to order its values
+                    slot = self.combined_heuristic(queue)
+                    stack.append(SearchLevel(slot, self.lcv_heuristic(slot, domain, assignment, overlaps)))
             
-        # Use LCV heuristic to order domain values
-        for word in self.lcv_heuristic(slot, domain, assignment, overlaps):
-            if self.check_consistent(slot, word, assignment, overlaps):
-                assignment[slot] = word
+            level = stack[-1]
+            if level.mark is not None:
+                # The subtree of the current value failed: take the value back
+                self.retract(level, assignment, domain, overlaps, trail, queue)
+            
+            descend = False
+            slot = level.slot
+            values = level.values
+            while level.cursor < len(values):
+                word = values[level.cursor]
+                level.cursor += 1
+                if self.check_consistent(slot, word, assignment, overlaps):
+                    self.assign_slot(slot, word, assignment, queue, overlaps)
+                    level.mark = len(trail)
+                    
+                    # Apply forward checking (and arc consistency with MAC) to reduce domains
+                    if self.propagate(slot, word, assignment, domain, overlaps, trail):
+                        self.refresh_keys(self.touched_slots(slot, trail, level.mark, overlaps),
+                                          assignment, domain, queue)
+                        descend = True
+                        break
+                    self.retract(level, assignment, domain, overlaps, trail, queue)
+            else:
+                # Every value failed: backtrack to the previous level
+                self.stats.backtracks += 1
+                for hook in self.stats.on_backtrack:
+                    hook(self.slots[slot], len(assignment))
+                stack.pop()
+                if not stack:
+                    return
+    
+    def backjump(self, assignment, domain, overlaps, trail, queue):
+        """Conflict-directed backjumping (FC-CBJ) with nogood learning, on an explicit stack.
+        
+        Conflicts are sets of crossing cells whose current letters explain a
+        failure. Returns (solution, None) on success, otherwise (None, conflict).
+        A level that placed none of the letters in the conflict returned by its
+        subtree is jumped over without trying its other values, and an exhausted
+        level with a small conflict stores its letter pattern as a nogood. With
+        distinct words, a value rejected because another slot holds the word adds
+        that slot's word pseudo-cell (cell_count + slot id) to the conflict, and
+        conflicts with such cells are not stored as nogoods.
+        """
+        stack = self.search_stack = []
+        if self.resume_levels is not None:
+            self.replay_levels(assignment, domain, overlaps, trail, queue)
+        descend = True
+        child_conflict = None  # Explanation of the failure of the top level's current value
+        while True:
+            if descend:
+                self.enter_node(assignment)
+                if not queue:
+                    return assignment, None
                 
-                # Apply forward checking to reduce domains
-                reduced_domains = self.forward_check(slot, word, assignment, domain, overlaps)
-                if reduced_domains is None:  # Domain wipeout - inconsistent assignment
-                    del assignment[slot]
+                slot = self.combined_heuristic(queue)
+                level = SearchLevel(slot, self.lcv_heuristic(slot, domain, assignment, overlaps))
+                level.conflict = set()
+                # Nogoods that this slot's letters alone would complete
+                level.patterns = self.nogoods.patterns([cell for _, cell in self.crossing_cells[slot]],
+                                                       self.cell_letters)
+                stack.append(level)
+            else:
+                level = stack[-1]
+                if level.mark is not None:
+                    # The current value failed because of child_conflict: take it back
+                    placed = level.placed
+                    self.retract(level, assignment, domain, overlaps, trail, queue)
+                    word_cell = self.cell_count + level.slot
+                    if child_conflict.isdisjoint(placed) and word_cell not in child_conflict:
+                        # The failure does not depend on this slot: jump over it
+                        self.stats.backjumps += 1
+                        stack.pop()
+                        if not stack:
+                            return None, child_conflict
+                        continue
+                    level.conflict.update(child_conflict.difference(placed))
+                    level.conflict.discard(word_cell)
+            
+            descend = False
+            slot = level.slot
+            values = level.values
+            crossing_cells = self.crossing_cells[slot]
+            while level.cursor < len(values):
+                word = values[level.cursor]
+                level.cursor += 1
+                if not self.check_consistent(slot, word, assignment, overlaps):
+                    owner = self.word_owner.get(word)
+                    if owner is not None:
+                        level.conflict.add(self.cell_count + owner)
                     continue
                 
-                # Create new domain with reduced values
-                new_domain = domain.copy()
-                for s, d in reduced_domains.items():
-                    new_domain[s] = d
-                
-                # Recursively continue
-                result = self.backtrack(assignment, new_domain, overlaps)
-                if result:
-                    return result
+                # Skip letter patterns that already failed
+                letters = {cell: word[pos] for pos, cell in crossing_cells}
+                nogood = next((nogood for pattern, nogood in level.patterns
+                               if all(letters[cell] == letter for cell, letter in pattern)), None)
+                if nogood is not None:
+                    self.stats.nogood_hits += 1
+                    self.nogoods.touch(nogood)
+                    level.conflict.update(cell for cell, _ in nogood if cell in self.cell_letters)
+                    continue
                 
-                # If we get here, this assignment didn't work
-                del assignment[slot]
+                self.assign_slot(slot, word, assignment, queue, overlaps)
+                self.assign_depth[slot] = len(assignment)
+                level.placed = self.place_letters(slot, letters)
+                level.mark = len(trail)
                 
-        return None
+                if self.propagate(slot, word, assignment, domain, overlaps, trail):
+                    self.refresh_keys(self.touched_slots(slot, trail, level.mark, overlaps), assignment, domain, queue)
+                    descend = True
+                else:
+                    child_conflict = self.wipeout_explanation
+                break
+            else:
+                # Values removed from this slot's domain are explained by its reducers
+                conflict = level.conflict
+                conflict.update(self.explanations[slot])
+                self.stats.backtracks += 1
+                for hook in self.stats.on_backtrack:
+                    hook(self.slots[slot], len(assignment))
+                if 0 < len(conflict) <= NOGOOD_MAX_CELLS and max(conflict) < self.cell_count:
+                    self.learn_nogood(conflict)
+                child_conflict = frozenset(conflict)
+                stack.pop()
+                if not stack:
+                    return None, child_conflict
     
-    def solve(self):
-        """Solve the crossword puzzle."""
+    def retract(self, level, assignment, domain, overlaps, trail, queue):
+        """Take back the current value of a search level, restoring what propagating it changed."""
+        slot = level.slot
+        touched = self.touched_slots(slot, trail, level.mark, overlaps)
+        self.undo_domains(domain, trail, level.mark)
+        self.unassign_slot(slot, assignment, overlaps)
+        if level.placed is not None:
+            for cell in level.placed:
+                del self.cell_letters[cell], self.cell_owner[cell]
+            level.placed = None
+        self.refresh_keys(touched, assignment, domain, queue)
+        level.mark = None
+    
+    def replay_levels(self, assignment, domain, overlaps, trail, queue):
+        """Rebuild the search stack saved in a checkpoint (self.resume_levels).
+        
+        Slot selection and value ordering are deterministic, so choosing a slot
+        and ordering its values again gives back each recorded level, and its
+        cursor tells which value was current. That value is assigned and
+        propagated as the search did, but no node is counted. CBJ levels get
+        their conflict and nogood patterns back, and the nogood store its
+        watches once every letter is placed again.
+        """
+        levels, self.resume_levels = self.resume_levels, None
+        for slot, cursor, conflict, patterns in levels:
+            if self.combined_heuristic(queue) != slot:
+                raise CheckpointError("the search does not retrace the checkpointed one")
+            level = SearchLevel(slot, self.lcv_heuristic(slot, domain, assignment, overlaps))
+            if not 0 < cursor <= len(level.values):
+                raise CheckpointError("the search does not retrace the checkpointed one")
+            level.cursor = cursor
+            word = level.values[cursor - 1]
+            if self.search == 'cbj':
+                crossing_cells = self.crossing_cells[slot]
+                cells = {cell for _, cell in crossing_cells}
+                level.conflict = set(conflict)
+                level.patterns = [(tuple(pair for pair in nogood if pair[0] in cells), frozenset(nogood))
+                                  for nogood in patterns]
+            self.assign_slot(slot, word, assignment, queue, overlaps)
+            if self.search == 'cbj':
+                self.assign_depth[slot] = len(assignment)
+                level.placed = self.place_letters(slot, {cell: word[pos] for pos, cell in crossing_cells})
+            level.mark = len(trail)
+            if not self.propagate(slot, word, assignment, domain, overlaps, trail):
+                raise CheckpointError("the search does not retrace the checkpointed one")
+            self.refresh_keys(self.touched_slots(slot, trail, level.mark, overlaps), assignment, domain, queue)
+            self.search_stack.append(level)
+        for pairs in self.resume_nogoods:
+            self.nogoods.add(frozenset(pairs), pairs[:2])
+        self.resume_nogoods = []
+    
+    def place_letters(self, slot, letters):
+        """Put the letters of a newly assigned slot on its crossing cells.
+        
+        Returns the cells that had no letter yet; the slot owns them until it is
+        unassigned.
+        """
+        placed = [cell for cell in letters if cell not in self.cell_letters]
+        for cell in placed:
+            self.cell_letters[cell] = letters[cell]
+            self.cell_owner[cell] = slot
+        self.nogoods.placed(letters, self.cell_letters)
+        return placed
+    
+    def learn_nogood(self, conflict):
+        """Store the current letters of the conflict cells as a nogood.
+        
+        The nogood watches the two cells that will lose their letters first as the
+        search unwinds: the ones placed by the deepest slots.
+        """
+        cell_letters = self.cell_letters
+        nogood = frozenset((cell, cell_letters[cell]) for cell in conflict)
+        deepest = sorted(conflict, key=lambda cell: (self.assign_depth[self.cell_owner[cell]], cell))[-2:]
+        self.nogoods.add(nogood, [(cell, cell_letters[cell]) for cell in deepest])
+    
+    def enter_node(self, assignment):
+        """Count a search node, honour budgets and cancellation, report progress and checkpoint.
+        
+        Budgets are checked and checkpoints written before the node is counted:
+        a resumed search rebuilds the search stack and enters this node again.
+        """
+        stats = self.stats
+        if self.node_cutoff is not None and stats.nodes >= self.node_cutoff:
+            if self.node_limit is not None and stats.nodes >= self.node_limit:
+                self.checkpoint()
+                raise BudgetExhausted()
+            raise RestartCutoff()
+        now = time.time()
+        if self.deadline is not None and now > self.deadline:
+            self.checkpoint()
+            raise BudgetExhausted()
+        if now >= self.next_checkpoint:
+            self.checkpoint()
+        
+        stats.nodes += 1
+        depth = len(assignment)
+        if depth > stats.max_depth:
+            stats.max_depth = depth
+        if self.stop_event is not None and now >= self.next_stop_check:
+            self.next_stop_check = now + STOP_CHECK_INTERVAL
+            if self.stop_event.is_set():
+                raise SearchStopped()
+        if now >= stats.next_progress:
+            stats.next_progress = now + stats.progress_interval
+            self.log_progress(depth, now)
+    
+    def log_progress(self, depth, now):
+        """Append a progress line to the log and pass it to the on_progress hooks."""
+        stats = self.stats
+        elapsed = now - self.start_time
+        line = (f"Progress: {stats.nodes} nodes ({stats.nodes / elapsed if elapsed > 0 else 0:.0f} nodes/sec), "
+                f"depth {depth}/{len(self.slots)}, max depth {stats.max_depth}, "
+                f"{stats.wipeouts} wipeouts, {self.search_progress():.4%} of the search tree explored "
+                f"in {elapsed:.1f} seconds")
+        self.solution_log.append(line)
+        for hook in stats.on_progress:
+            hook(line)
+    
+    def search_progress(self):
+        """Fraction of the current search tree already explored, read from the search stack.
+        
+        Each level has tried cursor - 1 of its values before the current one, and
+        the subtree of every value is weighted as an equal share of its parent's.
+        """
+        explored = 0.0
+        share = 1.0
+        for level in self.search_stack:
+            if not level.values:
+                break
+            explored += share * max(level.cursor - 1, 0) / len(level.values)
+            share /= len(level.values)
+        return explored
+    
+    def slot_cells(self, slot):
+        """Grid cells covered by a slot, in word order."""
+        direction, row, col, length = slot
+        if direction == 'H':
+            return [(row, col + i) for i in range(length)]
+        return [(row + i, col) for i in range(length)]
+    
+    def index_cells(self, overlaps):
+        """List the crossing cells of every slot id by position."""
+        self.cell_count = len(self.grid) * len(self.grid[0])
+        self.crossing_cells = [sorted({(pos1, cell) for _, pos1, _, cell in crossings}) for crossings in overlaps]
+    
+    def configure_search(self, seed, propagation):
+        """Set the propagation mode and the seed of the ordering tie-breaks."""
+        self.seed = seed
+        self.propagation = propagation
+        self.slot_order = list(range(len(self.slots)))
+        if seed is None:
+            self.value_salt = None
+        else:
+            rng = random.Random(seed)
+            rng.shuffle(self.slot_order)
+            self.value_salt = rng.getrandbits(32)
+    
+    def run_search(self, overlaps, slots):
+        """Search the given slot ids, restarting on the Luby schedule when restarts are enabled.
+        
+        Each restart gets RESTART_BASE_NODES times the next Luby term as its node
+        cutoff and a new seed for the ordering tie-breaks. Nogoods learned by
+        earlier restarts are kept.
+        """
+        if self.restarts is None:
+            self.node_cutoff = self.node_limit
+            return self.search_once(overlaps, slots)
+        
+        # Both are already set when resuming from a checkpoint
+        if self.restart_rng is None:
+            self.restart_rng = random.Random(self.seed)
+        while True:
+            if self.restart_cutoff is None:
+                self.restart_cutoff = self.stats.nodes + RESTART_BASE_NODES * luby(self.stats.restarts + 1)
+            self.node_cutoff = self.restart_cutoff
+            if self.node_limit is not None:
+                self.node_cutoff = min(self.node_cutoff, self.node_limit)
+            try:
+                solution = self.search_once(overlaps, slots)
+                self.restart_rng = self.restart_cutoff = None
+                return solution
+            except RestartCutoff:
+                self.restart_cutoff = None
+                self.stats.restarts += 1
+                self.configure_search(self.restart_rng.getrandbits(32), self.propagation)
+    
+    def search_once(self, overlaps, slots):
+        """Run one backtracking search over the given slot ids from a copy of the current domains.
+        
+        slots must be closed under overlaps (a union of connected components).
+        The solution maps their slot ids to words.
+        """
+        state = self.start_search(overlaps, slots)
+        if self.search == 'cbj':
+            return self.backjump(*state)[0]
+        return self.backtrack(*state)
+    
+    def start_search(self, overlaps, slots):
+        """Reset the search state of the given slot ids for a new search.
+        
+        Returns the (assignment, domain, overlaps, trail, queue) arguments of
+        the search engines, with a copy of the current domains.
+        """
+        domain = list(self.domain)
+        
+        # Variable selection state, updated incrementally during the search. A
+        # restart abandons the previous run without undoing it, so the
+        # explanations go back to the root ones too: no letter is placed there.
+        for slot in slots:
+            self.unassigned_degree[slot] = len(overlaps[slot])
+            self.explanations[slot] = frozenset()
+        queue = SlotQueue()
+        self.refresh_keys(slots, {}, domain, queue)
+        self.cell_letters = {}
+        self.cell_owner = {}
+        self.word_owner = {}
+        return {}, domain, overlaps, [], queue
+    
+    def connected_components(self, overlaps):
+        """Split the slot ids into the connected components of the constraint graph.
+        
+        Slots of different components share no cell, so each component can be
+        searched on its own. Components are listed by their first slot id, each
+        with its slot ids in increasing order.
+        """
+        seen = [False] * len(self.slots)
+        components = []
+        for start in range(len(self.slots)):
+            if seen[start]:
+                continue
+            seen[start] = True
+            stack = [start]
+            component = []
+            while stack:
+                slot = stack.pop()
+                component.append(slot)
+                for other_slot, _, _, _ in overlaps[slot]:
+                    if not seen[other_slot]:
+                        seen[other_slot] = True
+                        stack.append(other_slot)
+            components.append(sorted(component))
+        return components
+    
+    def merge_word_lengths(self, components):
+        """Merge the components that have slots of the same length.
+        
+        With distinct words, slots of the same length constrain each other
+        wherever they are in the grid, so only components that share no slot
+        length can be searched on their own.
+        """
+        parent = list(range(len(components)))
+        
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+        
+        first = {}  # Maps slot lengths to the first component with such a slot
+        for i, slots in enumerate(components):
+            for slot in slots:
+                root, other_root = find(i), find(first.setdefault(self.slots[slot][3], i))
+                if root != other_root:
+                    parent[max(root, other_root)] = min(root, other_root)
+        merged = defaultdict(list)
+        for i, slots in enumerate(components):
+            merged[find(i)].extend(slots)
+        return [sorted(merged[root]) for root in sorted(merged)]
+    
+    def residual_components(self, slots, overlaps):
+        """Split the given slot ids into the components of the constraint graph they induce."""
+        remaining = set(slots)
+        parts = []
+        while remaining:
+            start = remaining.pop()
+            part = [start]
+            stack = [start]
+            while stack:
+                for other_slot, _, _, _ in overlaps[stack.pop()]:
+                    if other_slot in remaining:
+                        remaining.remove(other_slot)
+                        part.append(other_slot)
+                        stack.append(other_slot)
+            parts.append(sorted(part))
+        return parts
+    
+    def component_key(self, slots, domain):
+        """Digest of a component of unassigned slot ids and their domains, its key in the count cache."""
+        digest = hashlib.blake2b(struct.pack(f'<{len(slots)}I', *slots), digest_size=16)
+        for slot in slots:
+            data = self.slot_index[slot].domain_bytes(domain[slot])
+            digest.update(struct.pack('<I', len(data)))
+            digest.update(data)
+        return digest.digest()
+    
+    def count_search(self, overlaps, slots):
+        """Count the solutions over the given slot ids, caching the count of every component met.
+        
+        Once some slots are assigned, the unassigned ones fall apart into
+        components that only interact with the assigned ones through letters
+        that propagation has already folded into their domains. The count of
+        such a component is therefore a function of its slots and domains: it
+        is kept in an LRU cache under component_key and read back instead of
+        searched again when the same component shows up, and the count under a
+        value is the product of the counts of its components. Slots are chosen
+        by MRV within a component. Runs on an explicit stack of CountLevels.
+        """
+        assignment, domain, overlaps, trail, _ = self.start_search(overlaps, slots)
+        cache = OrderedDict()
+        root = CountLevel(None, list(slots), None, [])
+        root.parts = self.residual_components(slots, overlaps)
+        stack = [root]
+        count = None  # Count of the component just finished, for the level below
+        while True:
+            level = stack[-1]
+            if count is not None:
+                level.product *= count
+                level.part += 1
+                count = None
+            
+            # Count the components under the current value, from the cache when possible
+            child = None
+            while level.parts is not None and level.product and level.part < len(level.parts):
+                part = level.parts[level.part]
+                key = self.component_key(part, domain)
+                cached = cache.get(key)
+                if cached is None:
+                    self.enter_node(assignment)
+                    slot = min(part, key=lambda slot: self.slot_key(slot, domain))
+                    child = CountLevel(key, part, slot, self.slot_index[slot].words_in(domain[slot]))
+                    break
+                cache.move_to_end(key)
+                self.stats.cache_hits += 1
+                level.product *= cached
+                level.part += 1
+            if child is not None:
+                stack.append(child)
+                continue
+            if level.parts is not None:
+                level.total += level.product
+                level.parts = None
+                if level.mark is not None:
+                    self.undo_domains(domain, trail, level.mark)
+                    self.unassign_slot(level.slot, assignment, overlaps)
+                    level.mark = None
+            
+            # Branch on the next value of the slot
+            slot = level.slot
+            values = level.values
+            while level.cursor < len(values):
+                word = values[level.cursor]
+                level.cursor += 1
+                if self.check_consistent(slot, word, assignment, overlaps):
+                    self.assign_slot(slot, word, assignment, None, overlaps)
+                    level.mark = len(trail)
+                    if self.propagate(slot, word, assignment, domain, overlaps, trail):
+                        level.parts = self.residual_components([other for other in level.slots if other != slot],
+                                                               overlaps)
+                        level.part = 0
+                        level.product = 1
+                        break
+                    self.undo_domains(domain, trail, level.mark)
+                    self.unassign_slot(slot, assignment, overlaps)
+                    level.mark = None
+            else:
+                stack.pop()
+                if not stack:
+                    return level.total
+                self.stats.backtracks += 1
+                cache[level.key] = level.total
+                if len(cache) > COUNT_CACHE_LIMIT:
+                    cache.popitem(last=False)
+                count = level.total
+    
+    def solve_components(self, overlaps, components):
+        """Search the components one after another and merge their solutions.
+        
+        Returns None as soon as a component has no solution. The components
+        solved so far are kept in self.solved_components for checkpoints.
+        """
+        solution = self.solved_components
+        for number, slots in enumerate(components, 1):
+            if number < self.component_number:
+                continue  # Solved before the checkpoint the search resumed from
+            self.component_number = number
+            component_solution = self.run_search(overlaps, slots)
+            if not component_solution:
+                self.solution_log.append(f"Component {number} ({len(slots)} slots) has no solution")
+                return None
+            solution.update(component_solution)
+        return solution
+    
+    def solve_components_parallel(self, overlaps, components):
+        """Search the components in a pool of forked processes and merge their solutions.
+        
+        The processes inherit the solver, so only the slot ids of each component
+        and its solution cross process boundaries. The pool is stopped as soon as
+        a component has no solution.
+        """
+        global _component_search
+        _component_search = (self, overlaps)
+        results = {}
+        try:
+            with multiprocessing.get_context('fork').Pool(self.workers) as pool:
+                for number, status, counters, solution in pool.imap_unordered(
+                        _component_worker, enumerate(components, 1)):
+                    self.stats.merge(counters)
+                    results[number] = (status, solution)
+                    if status == 'exhausted':
+                        self.solution_log.append(f"Component {number} ({len(components[number - 1])} slots) "
+                                                 f"has no solution")
+                        return None
+        finally:
+            _component_search = None
+        if any(status == 'budget' for status, _ in results.values()):
+            raise BudgetExhausted()
+        solution = {}
+        for number in sorted(results):
+            solution.update(results[number][1])
+        return solution
+    
+    def portfolio_configs(self):
+        """Search configuration of each portfolio worker.
+        
+        Worker 0 runs the configured search; the others use consecutive seeds
+        and alternate between the two propagation modes.
+        """
+        other_propagation = 'mac' if self.propagation == 'fc' else 'fc'
+        configs = [{'seed': self.seed, 'propagation': self.propagation}]
+        for worker_id in range(1, self.workers):
+            configs.append({'seed': (self.seed or 0) + worker_id,
+                            'propagation': other_propagation if worker_id % 2 else self.propagation})
+        return configs
+    
+    def solve_portfolio(self, overlaps, slots):
+        """Run the portfolio over the given slot ids in forked processes; the first solution wins.
+        
+        Workers inherit the dictionary, indexes and domains through fork, so the
+        words are never pickled (with a compiled dictionary they share the same
+        mapped pages). Once a solution arrives the others are asked to stop;
+        those that have not reported within PORTFOLIO_GRACE are terminated and
+        their counters are lost.
+        """
+        configs = self.portfolio_configs()
+        self.solution_log.append(f"Starting portfolio search with {len(configs)} workers...")
+        
+        context = multiprocessing.get_context('fork')
+        stop_event = context.Event()
+        workers = []
+        for worker_id, config in enumerate(configs):
+            parent_conn, child_conn = context.Pipe(duplex=False)
+            process = context.Process(target=_portfolio_worker, daemon=True,
+                                      args=(self, worker_id, config, overlaps, slots, child_conn, stop_event))
+            process.start()
+            child_conn.close()
+            workers.append((process, parent_conn))
+        
+        reports = {}
+        solution = None
+        winner = None
+        while len(reports) < len(workers) and winner is None:
+            pending = [(worker_id, process, conn) for worker_id, (process, conn) in enumerate(workers)
+                       if worker_id not in reports]
+            wait([conn for _, _, conn in pending] + [process.sentinel for _, process, _ in pending])
+            for worker_id, process, conn in pending:
+                if conn.poll():
+                    status, counters, assignment = conn.recv()
+                elif not process.is_alive():
+                    status, counters, assignment = 'failed', {'nodes': 0}, None
+                else:
+                    continue
+                reports[worker_id] = (status, counters)
+                if status == 'solved' and solution is None:
+                    solution = assignment
+                    winner = worker_id
+                    stop_event.set()
+        grace_end = time.time() + PORTFOLIO_GRACE
+        for worker_id, (process, conn) in enumerate(workers):
+            if worker_id not in reports:
+                report = ('terminated', {'nodes': 0})
+                if conn.poll(max(0.0, grace_end - time.time())):
+                    try:
+                        status, counters, _ = conn.recv()
+                        report = (status, counters)
+                    except EOFError:
+                        pass
+                reports[worker_id] = report
+            process.join(max(0.0, grace_end - time.time()))
+            if process.is_alive():
+                process.terminate()
+                process.join()
+            conn.close()
+        
+        for status, counters in reports.values():
+            self.stats.merge(counters)
+        for worker_id, config in enumerate(configs):
+            status, counters = reports[worker_id]
+            self.solution_log.append(f"  Worker {worker_id} (seed={config['seed']}, propagation={config['propagation']}): "
+                                     f"{status}, {counters['nodes']} nodes")
+        if winner is not None:
+            config = configs[winner]
+            self.solution_log.append(f"Worker {winner} won (seed={config['seed']}, propagation={config['propagation']})")
+        elif any(status == 'budget' for status, _ in reports.values()):
+            raise BudgetExhausted()
+        return solution
+    
+    def prepare_search(self):
+        """Start the clock and prepare the search of the whole grid.
+        
+        Finds the crossings, makes the domains arc consistent and splits the
+        slots into components. Returns (overlaps, components, consistent), where
+        consistent is False when arc consistency already wiped out a domain.
+        """
         self.start_time = time.time()
         self.solution_log.append(f"Starting solution at {time.ctime()}")
         self.solution_log.append(f"Grid size: {len(self.grid)}x{len(self.grid[0])}")
         self.solution_log.append(f"Number of slots: {len(self.slots)}")
+        if self.time_limit is not None:
+            self.deadline = self.start_time + self.time_limit
+        self.stats.next_progress = self.start_time + self.stats.progress_interval
         
         # Analyze the constraints
+        overlaps_start = time.time()
         overlaps = self.get_overlaps()
-        total_constraints = sum(len(o) for o in overlaps.values())
-        self.solution_log.append(f"Total constraints: {total_constraints}")
+        total_constraints = sum(len(crossings) for crossings in overlaps)
+        self.solution_log.append(f"Total constraints: {total_constraints} "
+                                 f"(found in {time.time() - overlaps_start:.2f} seconds)")
         
-        self.solution_log.append("Starting backtracking search with MRV, Degree, and LCV heuristics...")
-        solution = self.backtrack({}, self.domain, overlaps)
+        # Prune words without support in crossing slots before searching
+        self.index_cells(overlaps)
+        slot_ids = range(len(self.slots))
+        self.explanations = [frozenset()] * len(self.slots)
+        self.histograms = [[None] * slot[3] for slot in self.slots]
+        ac_start = time.time()
+        words_before = sum(self.domain_size(slot, self.domain) for slot in slot_ids)
+        arcs = [(slot, other_slot, pos1, pos2) for slot in slot_ids for other_slot, pos1, pos2, _ in overlaps[slot]]
+        consistent = self.arc_consistency(arcs, {}, self.domain, overlaps, [])
+        words_after = sum(self.domain_size(slot, self.domain) for slot in slot_ids) if consistent else 0
+        self.solution_log.append(f"Arc consistency kept {words_after} of {words_before} candidate words "
+                                 f"in {time.time() - ac_start:.2f} seconds")
         
+        # Independent parts of the grid are searched separately, the one with the
+        # smallest domain first so that an unsolvable part fails before the others
+        components = self.connected_components(overlaps)
+        if self.distinct_words:
+            components = self.merge_word_lengths(components)
+        if consistent:
+            components.sort(key=lambda slots: (min(self.domain_size(slot, self.domain) for slot in slots), len(slots)))
+        self.solution_log.append(f"Constraint graph has {len(components)} connected components, "
+                                 f"the largest with {max(map(len, components), default=0)} slots")
+        self.unassigned_degree = [len(crossings) for crossings in overlaps]
+        self.assign_depth = [0] * len(self.slots)
+        return overlaps, components, consistent
+    
+    def finish_search(self, components):
+        """Stop the clock and log the counters of the search."""
         end_time = time.time()
         self.elapsed_time = end_time - self.start_time
         
+        # ru_maxrss is in kilobytes on Linux; portfolio workers are children
+        self.peak_rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / 1024
+        stats = self.stats
+        nodes_per_sec = stats.nodes / self.elapsed_time if self.elapsed_time > 0 else 0
+        if self.workers > 1:
+            mode = f"portfolio of {self.workers}" if len(components) == 1 else f"{self.workers} component workers"
+        else:
+            mode = self.propagation
+        self.solution_log.append(f"Search nodes ({mode}): {stats.nodes} ({nodes_per_sec:.0f} nodes/sec), "
+                                 f"max depth: {stats.max_depth}, peak RSS: {self.peak_rss:.1f} MB")
+        self.solution_log.append(f"Backtracks: {stats.backtracks}, backjumps: {stats.backjumps}, "
+                                 f"wipeouts: {stats.wipeouts}, nogoods stored: {len(self.nogoods)}, "
+                                 f"nogood hits: {stats.nogood_hits}, restarts: {stats.restarts}")
+    
+    def solve(self):
+        """Solve the crossword puzzle."""
+        overlaps, components, consistent = self.prepare_search()
+        
+        if self.resume_file is not None and consistent:
+            self.read_checkpoint(self.resume_file)
+            self.solution_log.append(f"Resuming the search saved in {self.resume_file} after {self.stats.nodes} "
+                                     f"nodes (component {self.component_number} of {len(components)}, "
+                                     f"depth {len(self.resume_levels)})")
+        if self.checkpoint_file is not None:
+            self.next_checkpoint = time.time() + self.checkpoint_every
+        
+        budget_exhausted = False
+        try:
+            if not consistent:
+                solution = None
+            elif self.workers > 1 and len(components) == 1:
+                solution = self.solve_portfolio(overlaps, components[0])
+            else:
+                self.configure_search(self.seed, self.propagation)
+                restarts = f", {self.restarts} restarts" if self.restarts else ""
+                self.solution_log.append(f"Starting {self.search} search with MRV, Degree, and LCV heuristics "
+                                         f"(propagation: {self.propagation}{restarts})...")
+                if self.workers > 1:
+                    solution = self.solve_components_parallel(overlaps, components)
+                else:
+                    solution = self.solve_components(overlaps, components)
+        except BudgetExhausted:
+            solution = None
+            budget_exhausted = True
+        self.finish_search(components)
+        
         if solution:
             self.solution_log.append(f"Solution found in {self.elapsed_time:.2f} seconds!")
-            self.assignment = solution
+            self.assignment = {self.slots[slot]: word for slot, word in solution.items()}
+            self.status = 'solved'
             return True
+        elif budget_exhausted:
+            self.solution_log.append(f"Search budget exhausted after {self.elapsed_time:.2f} seconds "
+                                     f"and {self.stats.nodes} nodes.")
+            self.status = 'budget'
+            return False
         else:
             self.solution_log.append(f"No solution found after {self.elapsed_time:.2f} seconds.")
+            self.status = 'unsatisfiable'
             return False
     
+    def check_single_search(self):
+        """Reject the options that only apply to solve() before enumerating or counting."""
+        if self.checkpoint_file is not None or self.resume_file is not None:
+            raise ValueError("Checkpoints are only supported when solving for one solution")
+    
+    def iter_solutions(self, limit=None):
+        """Yield the solutions of the grid one at a time, up to limit (all when None).
+        
+        The whole grid is searched with chronological backtracking and the
+        configured propagation (search='cbj', restarts and workers only apply to
+        solve()), resuming the search after each solution, so solutions are
+        never collected in memory. Each one is yielded as a dict from slots to
+        words, also left in self.assignment. The time and node limits bound the
+        enumeration. When the generator finishes or is closed, self.solution_count
+        holds the number of solutions yielded and self.status is 'solved' if
+        there was at least one.
+        """
+        self.check_single_search()
+        overlaps, components, consistent = self.prepare_search()
+        self.solution_count = 0
+        outcome = 'complete'
+        try:
+            if consistent and limit != 0:
+                self.configure_search(self.seed, self.propagation)
+                self.node_cutoff = self.node_limit
+                self.solution_log.append(f"Enumerating solutions with backtracking, MRV, Degree, and LCV heuristics "
+                                         f"(propagation: {self.propagation}, limit: {limit or 'none'})...")
+                for solution in self.backtrack_solutions(*self.start_search(overlaps, range(len(self.slots)))):
+                    self.solution_count += 1
+                    self.assignment = {self.slots[slot]: word for slot, word in solution.items()}
+                    yield self.assignment
+                    if self.solution_count == limit:
+                        outcome = 'limit'
+                        break
+        except BudgetExhausted:
+            outcome = 'budget'
+        except GeneratorExit:
+            outcome = 'closed'
+            raise
+        finally:
+            self.finish_search(components)
+            reason = {'complete': "all solutions", 'limit': "solution limit reached",
+                      'budget': "search budget exhausted", 'closed': "enumeration stopped"}[outcome]
+            self.solution_log.append(f"Found {self.solution_count} solutions ({reason}) "
+                                     f"in {self.elapsed_time:.2f} seconds.")
+            if self.solution_count:
+                self.status = 'solved'
+            else:
+                self.status = 'budget' if outcome == 'budget' else 'unsatisfiable'
+    
+    def count_solutions(self):
+        """Count the solutions of the grid; returns None if the budget ran out first.
+        
+        Counting goes through count_search, which reuses the count of every
+        component of unassigned slots it meets again. With distinct words,
+        slots of the same length are linked all over the grid and the
+        components are no longer independent, so the solutions are enumerated
+        and counted one by one instead. self.status is 'solved' when there is
+        at least one solution.
+        """
+        self.check_single_search()
+        overlaps, components, consistent = self.prepare_search()
+        count = 0
+        budget_exhausted = False
+        try:
+            if consistent:
+                self.configure_search(self.seed, self.propagation)
+                self.node_cutoff = self.node_limit
+                slots = range(len(self.slots))
+                if self.distinct_words:
+                    self.solution_log.append(f"Counting solutions by enumeration, distinct words "
+                                             f"(propagation: {self.propagation})...")
+                    for _ in self.backtrack_solutions(*self.start_search(overlaps, slots)):
+                        count += 1
+                else:
+                    self.solution_log.append(f"Counting solutions with cached components "
+                                             f"(propagation: {self.propagation})...")
+                    count = self.count_search(overlaps, slots)
+        except BudgetExhausted:
+            budget_exhausted = True
+        self.finish_search(components)
+        
+        if budget_exhausted:
+            self.solution_log.append(f"Search budget exhausted after {self.elapsed_time:.2f} seconds "
+                                     f"and {self.stats.nodes} nodes, before all solutions were counted.")
+            self.status = 'budget'
+            self.solution_count = None
+        else:
+            self.solution_log.append(f"Counted {count} solutions in {self.elapsed_time:.2f} seconds "
+                                     f"({self.stats.cache_hits} components read from the cache).")
+            self.status = 'solved' if count else 'unsatisfiable'
+            self.solution_count = count
+        return self.solution_count
+    
+    def grid_digest(self):
+        """SHA-256 of the grid rows."""
+        return hashlib.sha256('\n'.join(self.grid).encode('utf-8')).digest()
+    
+    def checkpoint(self):
+        """Write the checkpoint, when enabled, and schedule the next one."""
+        if self.checkpoint_file is None:
+            return
+        self.write_checkpoint(self.checkpoint_file)
+        self.next_checkpoint = time.time() + self.checkpoint_every
+        self.solution_log.append(f"Checkpoint written to {self.checkpoint_file} after {self.stats.nodes} nodes "
+                                 f"(component {self.component_number}, depth {len(self.search_stack)})")
+    
+    def write_checkpoint(self, output_file):
+        """Save the search frontier in a compact binary file.
+        
+        After CHECKPOINT_HEADER come the integer search counters, the state of
+        the restart RNG (when restarts are running), the words of the components
+        already solved, one (slot, cursor, conflict cells, nogood patterns)
+        record per level of the search stack and the nogoods in LRU order, each
+        as its (cell, letter) pairs with the watched ones first. Domains are not
+        saved: resuming recomputes them and replays the stack. The file is
+        replaced atomically, so a kill while writing leaves the previous
+        checkpoint.
+        """
+        def pack_pairs(pairs):
+            return struct.pack(f'<B{2 * len(pairs)}I', len(pairs),
+                               *(value for cell, letter in pairs for value in (cell, ord(letter))))
+        
+        seed = self.seed if self.seed is not None else 0
+        cutoff = self.restart_cutoff if self.restart_cutoff is not None else -1
+        parts = [CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, self.dictionary.wordlist_digest(), self.grid_digest(),
+                                        len(self.slots), SEARCHES.index(self.search),
+                                        PROPAGATIONS.index(self.propagation), self.restarts is not None,
+                                        self.distinct_words, self.seed is not None, seed, cutoff, self.component_number,
+                                        self.stats.max_depth)]
+        counters = [getattr(self.stats, name) for name in SearchStats.COUNTERS]
+        parts.append(struct.pack(f'<I{len(counters)}Q', len(counters), *counters))
+        
+        if self.restart_rng is None:
+            parts.append(struct.pack('<I', 0))
+        else:
+            state = self.restart_rng.getstate()[1]
+            parts.append(struct.pack(f'<I{len(state)}I', len(state), *state))
+        
+        parts.append(struct.pack('<I', len(self.solved_components)))
+        for slot, word in self.solved_components.items():
+            data = word.encode('utf-8')
+            parts.append(struct.pack('<IH', slot, len(data)) + data)
+        
+        parts.append(struct.pack('<I', len(self.search_stack)))
+        for level in self.search_stack:
+            conflict = sorted(level.conflict or ())
+            patterns = level.patterns or ()
+            parts.append(struct.pack(f'<IIH{len(conflict)}IH', level.slot, level.cursor, len(conflict), *conflict,
+                                     len(patterns)))
+            parts.extend(pack_pairs(sorted(nogood)) for _, nogood in patterns)
+        
+        parts.append(struct.pack('<I', len(self.nogoods.nogoods)))
+        for nogood, watches in self.nogoods.nogoods.items():
+            parts.append(pack_pairs(watches + sorted(pair for pair in nogood if pair not in watches)))
+        
+        tmp_file = output_file + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            f.write(b''.join(parts))
+        os.replace(tmp_file, output_file)
+    
+    def read_checkpoint(self, input_file):
+        """Load a checkpoint written by write_checkpoint for this grid, wordlist and search.
+        
+        Restores the counters, search configuration, restart RNG and solved
+        components, and leaves the search stack and the nogoods in
+        self.resume_levels and self.resume_nogoods for the search to replay.
+        Raises CheckpointError when the file is not a checkpoint of this search.
+        """
+        with open(input_file, 'rb') as f:
+            data = f.read()
+        offset = 0
+        
+        def take(fmt):
+            nonlocal offset
+            values = struct.unpack_from(fmt, data, offset)
+            offset += struct.calcsize(fmt)
+            return values
+        
+        def take_pairs():
+            values = take(f'<{2 * take("<B")[0]}I')
+            return [(values[i], chr(values[i + 1])) for i in range(0, len(values), 2)]
+        
+        try:
+            (magic, words_digest, grid_digest, slot_count, search, propagation, restarts, distinct_words,
+             has_seed, seed, cutoff, component_number, max_depth) = take(CHECKPOINT_HEADER.format)
+            if magic != CHECKPOINT_MAGIC:
+                raise CheckpointError(f"{input_file} is not a checkpoint")
+            if words_digest != self.dictionary.wordlist_digest():
+                raise CheckpointError(f"{input_file} was written with a different wordlist")
+            if grid_digest != self.grid_digest() or slot_count != len(self.slots):
+                raise CheckpointError(f"{input_file} was written for a different grid")
+            if (SEARCHES[search], PROPAGATIONS[propagation], bool(restarts), bool(distinct_words)) != (
+                    self.search, self.propagation, self.restarts is not None, self.distinct_words):
+                raise CheckpointError(f"{input_file} was written by a {SEARCHES[search]} search with "
+                                      f"{PROPAGATIONS[propagation]} propagation"
+                                      f"{', restarts' if restarts else ''}"
+                                      f"{', distinct words' if distinct_words else ''}; "
+                                      f"resume it with the same options")
+            
+            counters = take(f'<{take("<I")[0]}Q')
+            state_size = take('<I')[0]
+            rng_state = take(f'<{state_size}I') if state_size else None
+            solved = {}
+            for _ in range(take('<I')[0]):
+                slot, size = take('<IH')
+                solved[slot] = data[offset:offset + size].decode('utf-8')
+                offset += size
+            levels = []
+            for _ in range(take('<I')[0]):
+                slot, cursor, size = take('<IIH')
+                conflict = take(f'<{size}I')
+                patterns = [take_pairs() for _ in range(take('<H')[0])]
+                levels.append((slot, cursor, conflict, patterns))
+            nogoods = [take_pairs() for _ in range(take('<I')[0])]
+        except struct.error:
+            raise CheckpointError(f"{input_file} is truncated") from None
+        
+        for name, value in zip(SearchStats.COUNTERS, counters):
+            setattr(self.stats, name, value)
+        self.stats.max_depth = max_depth
+        self.seed = seed if has_seed else None
+        self.restart_cutoff = cutoff if cutoff >= 0 else None
+        if rng_state is not None:
+            self.restart_rng = random.Random()
+            self.restart_rng.setstate((3, rng_state, None))
+        self.component_number = component_number
+        self.solved_components = solved
+        self.resume_levels = levels
+        self.resume_nogoods = nogoods
+    
     def get_filled_grid(self):
         """Return the grid filled with assigned words."""
         filled_grid = [list(row) for row in self.grid]
@@ -280,59 +2241,152 @@ class CrosswordCSP:
             for row in self.get_filled_grid():
                 f.write(row + '\n')
     
+    def write_solutions(self, limit=None, output_format='jsonl'):
+        """Enumerate up to limit solutions with iter_solutions, writing each one as soon as it is found.
+        
+        output_format 'jsonl' writes one {"solution": n, "grid": rows} line per
+        solution to solutions/<grid>_solutions.jsonl; 'files' writes each grid to
+        solutions/<grid>_solution_<n>.txt like write_solution. Returns the path
+        of the JSONL file or the pattern of the solution files.
+        """
+        grid_name = os.path.basename(self.grid_file).split('.')[0]
+        os.makedirs('solutions', exist_ok=True)
+        if output_format == 'files':
+            for number, _ in enumerate(self.iter_solutions(limit), 1):
+                self.write_solution(f"solutions/{grid_name}_solution_{number}.txt")
+            return f"solutions/{grid_name}_solution_<n>.txt"
+        
+        path = f"solutions/{grid_name}_solutions.jsonl"
+        with open(path, 'w', encoding='utf-8') as f:
+            for number, _ in enumerate(self.iter_solutions(limit), 1):
+                f.write(json.dumps({'solution': number, 'grid': self.get_filled_grid()}, ensure_ascii=False) + '\n')
+                f.flush()
+        return path
+    
+    def log_text(self):
+        """The solution log as write_log writes it, with the total time and the word assignments."""
+        lines = [line + '\n' for line in self.solution_log]
+        lines.append(f"\nTotal time: {self.elapsed_time:.2f} seconds\n")
+        
+        # Add details about the assignment
+        lines.append("\nWord assignments:\n")
+        for slot, word in self.assignment.items():
+            direction, row, col, length = slot
+            dir_name = "Horizontal" if direction == 'H' else "Vertical"
+            lines.append(f"{dir_name} at ({row},{col}), length {length}: {word}\n")
+        return ''.join(lines)
+    
     def write_log(self, log_file):
         """Write the solution log to a file."""
         with open(log_file, 'w') as f:
-            for line in self.solution_log:
-                f.write(line + '\n')
-            
-            f.write(f"\nTotal time: {self.elapsed_time:.2f} seconds\n")
-            
-            # Add details about the assignment
-            f.write("\nWord assignments:\n")
-            for slot, word in self.assignment.items():
-                direction, row, col, length = slot
-                dir_name = "Horizontal" if direction == 'H' else "Vertical"
-                f.write(f"{dir_name} at ({row},{col}), length {length}: {word}\n")
-    
-    def run(self):
-        """Run the full solution process."""
+            f.write(self.log_text())
+    
+    def stats_report(self):
+        """Final report of the search: configuration, outcome and counters."""
+        report = {'grid': self.grid_file, 'slots': len(self.slots), 'status': self.status,
+                  'search': self.search, 'propagation': self.propagation, 'seed': self.seed,
+                  'workers': self.workers, 'elapsed_time': self.elapsed_time,
+                  'nodes_per_sec': self.stats.nodes / self.elapsed_time if self.elapsed_time > 0 else 0,
+                  'peak_rss_mb': self.peak_rss, 'nogoods_stored': len(self.nogoods),
+                  'distinct_words': self.distinct_words}
+        if self.solution_count is not None:
+            report['solutions'] = self.solution_count
+        report.update(self.stats.counters())
+        return report
+    
+    def write_stats(self, output_file):
+        """Write the final search report as JSON."""
+        with open(output_file, 'w') as f:
+            json.dump(self.stats_report(), f, indent=2)
+    
+    def write_profile(self, profiler, output_file):
+        """Dump the profile for pstats and a text summary next to it."""
+        profiler.dump_stats(output_file)
+        with open(os.path.splitext(output_file)[0] + '.txt', 'w') as f:
+            pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(40)
+    
+    def save_outputs(self, profiler=None):
+        """Write the outputs under solutions/ and logs/; returns their paths by kind.
+        
+        The solution is written only when the grid was solved for one solution
+        (write_solutions writes enumerated ones as they are found); the log and
+        the stats report always are, and the profile when a profiler is given.
+        """
         grid_name = os.path.basename(self.grid_file).split('.')[0]
         
+        # Create directories if they don't exist
+        os.makedirs('solutions', exist_ok=True)
+        os.makedirs('logs', exist_ok=True)
+        
+        paths = {}
+        if self.status == 'solved' and self.solution_count is None:
+            paths['solution'] = f"solutions/{grid_name}_solution.txt"
+            self.write_solution(paths['solution'])
+        paths['log'] = f"logs/{grid_name}_solution_log.txt"
+        self.write_log(paths['log'])
+        paths['stats'] = f"logs/{grid_name}_stats.json"
+        self.write_stats(paths['stats'])
+        if profiler is not None:
+            paths['profile'] = f"logs/{grid_name}_profile.prof"
+            self.write_profile(profiler, paths['profile'])
+        return paths
+    
+    def run(self, count=False, max_solutions=None, solutions_format='jsonl'):
+        """Run the full solution process.
+        
+        By default the grid is solved for one solution. count=True counts the
+        solutions instead, and max_solutions enumerates up to that many (0 for
+        all), writing them with write_solutions in solutions_format.
+        """
         print(f"Loading grid from {self.grid_file}...")
         self.load_grid()
         
-        print(f"Loading words from {self.words_file}...")
-        self.load_words()
-        
         print("Identifying word slots in the grid...")
         self.identify_slots()
         print(f"Found {len(self.slots)} slots")
         
+        print(f"Loading words from {self.words_file}...")
+        self.load_words()
+        
         print("Initializing domains...")
         self.initialize_domains()
         
         print("Starting CSP solver...")
-        solved = self.solve()
+        self.stats.add_hook('on_progress', print)
+        if count:
+            search = self.count_solutions
+        elif max_solutions is not None:
+            search = lambda: self.write_solutions(max_solutions or None, solutions_format)
+        else:
+            search = self.solve
+        if self.profile:
+            profiler = cProfile.Profile()
+            result = profiler.runcall(search)
+        else:
+            profiler = None
+            result = search()
+        solved = self.status == 'solved'
         
-        if solved:
-            # Create directories if they don't exist
-            os.makedirs('solutions', exist_ok=True)
-            os.makedirs('logs', exist_ok=True)
-            
-            output_file = f"solutions/{grid_name}_solution.txt"
-            log_file = f"logs/{grid_name}_solution_log.txt"
-            
-            print("Writing solution to files...")
-            self.write_solution(output_file)
-            self.write_log(log_file)
-            
+        print("Writing output files...")
+        paths = self.save_outputs(profiler)
+        if count and self.solution_count is not None:
+            print(f"Counted {self.solution_count} solutions in {self.elapsed_time:.2f} seconds "
+                  f"({self.stats.cache_hits} components read from the cache)")
+        elif max_solutions is not None:
+            print(f"Found {self.solution_count} solutions in {self.elapsed_time:.2f} seconds")
+            print(f"Solutions written to {result}")
+        elif solved:
             print(f"Solution found in {self.elapsed_time:.2f} seconds!")
-            print(f"Solution written to {output_file}")
-            print(f"Solution log written to {log_file}")
-        else:
+            print(f"Solution written to {paths['solution']}")
+        if self.status == 'budget':
+            print(f"Search budget exhausted after {self.elapsed_time:.2f} seconds and {self.stats.nodes} nodes.")
+        elif not solved:
             print("No solution found.")
-
+        print(f"Solution log written to {paths['log']}")
+        print(f"Search stats written to {paths['stats']}")
+        if profiler is not None:
+            print(f"Profile written to {paths['profile']}")
+        return solved
 
 def main():
     parser = argparse.ArgumentParser(description='Solve crossword puzzles using CSP')
@@ -340,9 +2394,81 @@ def main():
                         help='Path to the grid file (default: input_files/grid-11x11-20W-83L-38B.txt)')
     parser.add_argument('--wordlist', default='input_files/lista_palavras.txt',
                         help='Path to the wordlist file (default: input_files/lista_palavras.txt)')
+    parser.add_argument('--dict-file', default=None,
+                        help='Path to the compiled dictionary (default: <wordlist>.cwdict)')
+    parser.add_argument('--propagation', choices=['fc', 'mac'], default='fc',
+                        help='Constraint propagation during search: forward checking or '
+                             'maintaining arc consistency (default: fc)')
+    parser.add_argument('--search', choices=['backtrack', 'cbj'], default='backtrack',
+                        help='Search strategy: chronological backtracking or conflict-directed '
+                             'backjumping with nogood learning (default: backtrack)')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Seed for randomized tie-breaking in variable and value ordering')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of parallel portfolio workers, first solution wins (default: 1)')
+    parser.add_argument('--time-limit', type=float, default=None,
+                        help='Give up the search after this many seconds')
+    parser.add_argument('--node-limit', type=int, default=None,
+                        help='Give up the search after this many nodes (per worker with --workers)')
+    parser.add_argument('--restarts', choices=['luby'], default=None,
+                        help='Restart the search with new tie-breaks after a node cutoff that grows '
+                             'by the Luby sequence')
+    parser.add_argument('--backend', choices=sorted(INDEX_BACKENDS), default='bitset',
+                        help='Domain representation: Python int bitsets or numpy masks over a '
+                             'letter matrix (default: bitset)')
+    parser.add_argument('--checkpoint', metavar='FILE', default=None,
+                        help='Periodically save the search state to FILE so it can be resumed')
+    parser.add_argument('--checkpoint-every', metavar='SECONDS', type=float, default=CHECKPOINT_INTERVAL,
+                        help=f'Seconds between checkpoints (default: {CHECKPOINT_INTERVAL:.0f})')
+    parser.add_argument('--resume', metavar='FILE', default=None,
+                        help='Continue the search saved in a checkpoint FILE (same grid, wordlist and '
+                             'search options)')
+    parser.add_argument('--distinct-words', action='store_true',
+                        help='Forbid using the same word in more than one slot')
+    solutions = parser.add_mutually_exclusive_group()
+    solutions.add_argument('--count', action='store_true',
+                           help='Count the solutions instead of stopping at the first one')
+    solutions.add_argument('--max-solutions', metavar='N', type=int, default=None,
+                           help='Enumerate up to N solutions (0 for all), writing each one as it is found')
+    parser.add_argument('--solutions-format', choices=['jsonl', 'files'], default='jsonl',
+                        help='Output of --max-solutions: one JSON line per solution or one file per '
+                             'solution (default: jsonl)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Profile the solve with cProfile and write the stats next to the log')
+    parser.add_argument('--compile-dict', action='store_true',
+                        help='Compile the wordlist into the binary dictionary and exit')
     
     args = parser.parse_args()
     
+    if not os.path.exists(args.wordlist):
+        print(f"Error: Wordlist file '{args.wordlist}' not found.")
+        return 1
+    
+    if args.backend == 'numpy' and np is None:
+        print("Error: The numpy backend requires numpy (pip install numpy).")
+        return 1
+    
+    if (args.checkpoint or args.resume) and args.workers > 1:
+        print("Error: Checkpoints require a single-process search (--workers 1).")
+        return 1
+    
+    if (args.count or args.max_solutions is not None) and (
+            args.workers > 1 or args.search != 'backtrack' or args.restarts or args.checkpoint or args.resume):
+        print("Error: --count and --max-solutions run a single backtracking search "
+              "(no --workers, --search cbj, --restarts or checkpoints).")
+        return 1
+    
+    if args.resume and not os.path.exists(args.resume):
+        print(f"Error: Checkpoint file '{args.resume}' not found.")
+        return 1
+    
+    dict_file = args.dict_file or args.wordlist + '.cwdict'
+    if args.compile_dict:
+        start = time.time()
+        word_count = compile_dictionary(args.wordlist, dict_file)
+        print(f"Compiled {word_count} words into {dict_file} in {time.time() - start:.2f} seconds")
+        return 0
+    
     # Adjust grid path if not already in input_files directory
     if not args.grid_file.startswith('input_files/') and os.path.exists(f'input_files/{args.grid_file}'):
         args.grid_file = f'input_files/{args.grid_file}'
@@ -351,13 +2477,19 @@ def main():
         print(f"Error: Grid file '{args.grid_file}' not found.")
         return 1
     
-    if not os.path.exists(args.wordlist):
-        print(f"Error: Wordlist file '{args.wordlist}' not found.")
+    solver = CrosswordCSP(args.grid_file, args.wordlist, dict_file, args.propagation, args.seed, args.workers,
+                          search=args.search, time_limit=args.time_limit, node_limit=args.node_limit,
+                          restarts=args.restarts, profile=args.profile, backend=args.backend,
+                          checkpoint_file=args.checkpoint, checkpoint_every=args.checkpoint_every,
+                          resume_file=args.resume, distinct_words=args.distinct_words)
+    try:
+        solver.run(args.count, args.max_solutions, args.solutions_format)
+    except CheckpointError as e:
+        print(f"Error: Cannot resume: {e}.")
         return 1
-    
-    solver = CrosswordCSP(args.grid_file, args.wordlist)
-    solver.run()
+    if solver.status == 'budget':
+        return EXIT_BUDGET_EXHAUSTED
     return 0
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main()) 
\ No newline at end of file
@@ -0,0 +1,150 @@
+import os
+import sys
+import glob
+import time
+import argparse
+import multiprocessing
+
+from crossword_csp import CrosswordCSP, WordDictionary, INDEX_BACKENDS, np
+
+# Dicionário do lote, criado em main antes do pool de --jobs: os processos
+# o recebem já indexado pelo fork, e _solve_in_pool o usa em cada grid
+_dictionary = None
+
+
+def find_grids(inputs):
+    """Expand directories and glob patterns into the list of grid files."""
+    grids = []
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            grids.extend(sorted(glob.glob(os.path.join(pattern, '*.txt'))))
+        else:
+            grids.extend(sorted(glob.glob(pattern)))
+    # Remove duplicados mantendo a ordem
+    return list(dict.fromkeys(grids))
+
+
+def index_grid_lengths(grids, dictionary):
+    """Load the words and build the letter indexes of every slot length used by the grids."""
+    lengths = set()
+    for grid_file in grids:
+        solver = CrosswordCSP(grid_file, dictionary.words_file, dictionary=dictionary)
+        solver.load_grid()
+        solver.identify_slots()
+        lengths.update(slot[3] for slot in solver.slots)
+    dictionary.load(lengths)
+    for length in sorted(lengths):
+        dictionary.index(length)
+    return lengths
+
+
+def solve_one(grid_file, dictionary, options):
+    """Solve one grid with the shared dictionary and write its solution and log."""
+    start = time.time()
+    result = {'grid': grid_file, 'slots': 0, 'status': 'erro', 'nodes': 0, 'solve_time': 0.0}
+    try:
+        solver = CrosswordCSP(grid_file, dictionary.words_file, dictionary=dictionary, **options)
+        solver.load_grid()
+        solver.identify_slots()
+        solver.load_words()
+        solver.initialize_domains()
+        solver.solve()
+        solver.save_outputs()
+        status = {'solved': 'resolvido', 'budget': 'orçamento esgotado'}.get(solver.status, 'sem solução')
+        result.update(slots=len(solver.slots), status=status,
+                      nodes=solver.stats.nodes, solve_time=solver.elapsed_time)
+    except Exception as e:
+        result['status'] = f'erro: {e}'
+    result['total_time'] = time.time() - start
+    return result
+
+
+def _solve_in_pool(task):
+    """Pool entry point: solve a grid with the dictionary inherited from the parent."""
+    grid_file, options = task
+    return solve_one(grid_file, _dictionary, options)
+
+
+def print_summary(results, total_time):
+    """Print the per-grid summary table."""
+    name_width = max([len('Grid')] + [len(os.path.basename(r['grid'])) for r in results])
+    header = f"{'Grid':<{name_width}}  {'Slots':>5}  {'Nós':>10}  {'Busca (s)':>9}  {'Total (s)':>9}  Status"
+    print(f"\n{header}")
+    print('-' * len(header))
+    for r in results:
+        print(f"{os.path.basename(r['grid']):<{name_width}}  {r['slots']:>5}  {r['nodes']:>10}  "
+              f"{r['solve_time']:>9.2f}  {r['total_time']:>9.2f}  {r['status']}")
+    print('-' * len(header))
+    solved = sum(1 for r in results if r['status'] == 'resolvido')
+    print(f"{solved}/{len(results)} grids resolvidos em {total_time:.2f} segundos")
+
+
+def main():
+    global _dictionary
+
+    parser = argparse.ArgumentParser(description='Resolve vários grids em um único processo, carregando o dicionário uma só vez')
+    parser.add_argument('inputs', nargs='+',
+                        help='Diretórios ou padrões glob de arquivos de grid (ex.: "input_files/*.txt")')
+    parser.add_argument('--wordlist', default='input_files/lista_palavras.txt',
+                        help='Arquivo com a lista de palavras (default: input_files/lista_palavras.txt)')
+    parser.add_argument('--dict-file', default=None,
+                        help='Dicionário compilado (default: <wordlist>.cwdict)')
+    parser.add_argument('--propagation', choices=['fc', 'mac'], default='fc',
+                        help='Propagação de restrições durante a busca (default: fc)')
+    parser.add_argument('--search', choices=['backtrack', 'cbj'], default='backtrack',
+                        help='Estratégia de busca: backtracking cronológico ou backjumping com nogoods (default: backtrack)')
+    parser.add_argument('--backend', choices=sorted(INDEX_BACKENDS), default='bitset',
+                        help='Representação dos domínios: bitsets de inteiros ou máscaras numpy (default: bitset)')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Semente para o desempate das heurísticas')
+    parser.add_argument('--time-limit', type=float, default=None,
+                        help='Tempo máximo de busca por grid, em segundos')
+    parser.add_argument('--node-limit', type=int, default=None,
+                        help='Número máximo de nós de busca por grid')
+    parser.add_argument('--restarts', choices=['luby'], default=None,
+                        help='Reinicia a busca com novos desempates seguindo a sequência de Luby')
+    parser.add_argument('--distinct-words', action='store_true',
+                        help='Proíbe usar a mesma palavra em mais de um slot')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Número de processos para resolver grids em paralelo (default: 1)')
+
+    args = parser.parse_args()
+
+    grids = find_grids(args.inputs)
+    if not grids:
+        print("Erro: Nenhum arquivo de grid encontrado.")
+        return 1
+
+    # Verifica se a lista de palavras existe
+    if not os.path.exists(args.wordlist):
+        print(f"Erro: Arquivo de palavras '{args.wordlist}' não encontrado.")
+        return 1
+
+    if args.backend == 'numpy' and np is None:
+        print("Erro: O backend numpy requer o numpy (pip install numpy).")
+        return 1
+
+    start_total = time.time()
+
+    # Carrega o dicionário e os índices por comprimento uma única vez
+    print(f"Carregando palavras de {args.wordlist}...")
+    _dictionary = WordDictionary(args.wordlist, args.dict_file, args.backend)
+    lengths = index_grid_lengths(grids, _dictionary)
+    print(f"Dicionário e índices ({len(lengths)} comprimentos) prontos em {time.time() - start_total:.2f} segundos")
+
+    options = {'propagation': args.propagation, 'search': args.search, 'seed': args.seed,
+               'time_limit': args.time_limit, 'node_limit': args.node_limit, 'restarts': args.restarts,
+               'distinct_words': args.distinct_words}
+    print(f"Resolvendo {len(grids)} grids com {args.jobs} processo(s)...")
+    if args.jobs > 1:
+        with multiprocessing.get_context('fork').Pool(args.jobs) as pool:
+            results = pool.map(_solve_in_pool, [(grid_file, options) for grid_file in grids], chunksize=1)
+    else:
+        results = [solve_one(grid_file, _dictionary, options) for grid_file in grids]
+
+    print_summary(results, time.time() - start_total)
+    return 0 if all(r['status'] == 'resolvido' for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,9 +6,181 @@
 import os
 import sys
 import subprocess
+import json
 import time
+import hashlib
 import argparse
 
+from crossword_csp import CrosswordCSP, WordDictionary
+from solver_daemon import DEFAULT_ADDRESS, RESULT_FIELDS, DaemonError, call_daemon, daemon_health, same_wordlist
+
+CACHE_VERSION = 2  # Muda quando o formato das entradas do cache muda
+DEFAULT_CACHE_DIR = 'cache'
+DEFAULT_CACHE_SIZE = 64  # Tamanho máximo do cache de resultados, em MB
+
+def valid_entry(entry):
+    """Whether a cache entry read from JSON has the fields and types solve_from_cache uses."""
+    return (isinstance(entry, dict) and isinstance(entry.get('solution'), list)
+            and all(isinstance(row, str) for row in entry['solution'])
+            and isinstance(entry.get('log'), str) and isinstance(entry.get('created'), (int, float))
+            and isinstance(entry.get('stats'), dict)
+            and isinstance(entry['stats'].get('elapsed_time'), (int, float)))
+
+class ResultCache:
+    """Solved grids kept as JSON files named by a hash of everything that determines the solution.
+    
+    The key covers the grid contents, the wordlist contents and the solver
+    options, so editing any of them misses. Hits touch their entry, and once
+    the directory grows past max_bytes the entries used longest ago are removed.
+    """
+    
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+    
+    def key(self, grid_file, words_digest, options):
+        """Hex key of a grid file solved with a wordlist (by digest) and options."""
+        digest = hashlib.sha256()
+        with open(grid_file, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+        digest.update(words_digest)
+        # O limite de tempo decide se a busca termina, não qual solução ela encontra
+        digest.update(json.dumps({name: value for name, value in options.items() if name != 'time_limit'},
+                                 sort_keys=True).encode('utf-8'))
+        digest.update(str(CACHE_VERSION).encode('ascii'))
+        return digest.hexdigest()
+    
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+    
+    def get(self, key):
+        """The entry stored under key, or None."""
+        path = self.path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            self.remove(key)
+            return None
+        if not valid_entry(entry):
+            # JSON válido com outro formato, como o de uma versão antiga: tratada como corrompida
+            self.remove(key)
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:  # Removida por outra execução entre a leitura e o toque
+            pass
+        return entry
+    
+    def put(self, key, entry):
+        """Store entry under key, then evict down to max_bytes."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        # Escreve em um temporário e renomeia, para que outra execução nunca leia uma entrada pela metade
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(entry, f)
+        os.replace(temp_path, path)
+        self.evict()
+    
+    def remove(self, key):
+        try:
+            os.unlink(self.path(key))
+        except FileNotFoundError:
+            pass
+    
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for item in it:
+                if item.name.endswith('.json'):
+                    stat = item.stat()
+                    entries.append((stat.st_mtime, stat.st_size, item.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+def verify_solution(solver, rows, distinct_words=False):
+    """Whether rows fill the grid of solver (slots identified, words loaded) with dictionary words.
+    
+    Blocked cells and pre-filled letters must be unchanged, and the word of
+    every slot must be in the set of dictionary words of its length.
+    """
+    grid = solver.grid
+    if len(rows) != len(grid) or any(len(row) != len(line) for row, line in zip(rows, grid)):
+        return False
+    for row, line in zip(rows, grid):
+        for cell, original in zip(row, line):
+            if original != '?' and cell.upper() != original.upper():
+                return False
+    
+    word_sets = {}
+    words = []
+    for direction, row, col, length in solver.slots:
+        if direction == 'H':
+            word = rows[row][col:col + length]
+        else:
+            word = ''.join(rows[row + i][col] for i in range(length))
+        if length not in word_sets:
+            block = solver.dictionary.words_by_length.get(length)
+            word_sets[length] = block.word_set() if block is not None else set()
+        if word not in word_sets[length]:
+            return False
+        words.append(word)
+    return not distinct_words or len(set(words)) == len(words)
+
+def write_outputs(grid_file, result):
+    """Write a solve result as the solution, log and stats files crossword_csp.py writes."""
+    grid_name = os.path.basename(grid_file).split('.')[0]
+    os.makedirs('solutions', exist_ok=True)
+    os.makedirs('logs', exist_ok=True)
+    if result['solution'] is not None:
+        with open(f"solutions/{grid_name}_solution.txt", 'w') as f:
+            f.write(''.join(row + '\n' for row in result['solution']))
+    with open(f"logs/{grid_name}_solution_log.txt", 'w') as f:
+        f.write(result['log'])
+    with open(f"logs/{grid_name}_stats.json", 'w') as f:
+        json.dump(result['stats'], f, indent=2)
+
+def solve_from_cache(cache, key, grid_file, words_file, dictionary, options):
+    """Write the outputs of a cached solution of the grid; returns the entry, or None without a valid one.
+    
+    An entry is trusted only after verify_solution checks it against the
+    words of the wordlist; entries that fail are dropped.
+    """
+    start_time = time.time()
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    
+    solver = CrosswordCSP(grid_file, words_file, dictionary=dictionary)
+    solver.load_grid()
+    solver.identify_slots()
+    solver.load_words()
+    if not verify_solution(solver, entry['solution'], options.get('distinct_words', False)):
+        print(f"A entrada {key[:12]} do cache não confere com o grid e a lista de palavras; descartando.")
+        cache.remove(key)
+        return None
+    
+    # Os arquivos de saída são os mesmos da execução que resolveu o grid
+    write_outputs(grid_file, entry)
+    print(f"\n{'='*60}")
+    print(f"ETAPA: Solução recuperada do cache ({cache.path(key)})")
+    print(f"{'='*60}\n")
+    print(f"Verificada contra a lista de palavras em {time.time() - start_time:.3f} segundos "
+          f"(resolvido em {time.ctime(entry['created'])}; a busca original levou "
+          f"{entry['stats']['elapsed_time']:.2f} segundos)")
+    return entry
+
 def run_command(command, description):
     """Run a command and print its output."""
     print(f"\n{'='*60}")
@@ -32,11 +204,79 @@ def run_command(command, description):
     print(f"Tempo total: {elapsed:.2f} segundos")
     return result.returncode == 0
 
+def solve_with_daemon(grid_file, words_file, address, options):
+    """Solve the grid in a running solver_daemon and write the usual output files.
+    
+    Returns None when no daemon with the same wordlist answers at address, so
+    the caller solves the grid itself; otherwise the result of the daemon.
+    """
+    try:
+        health = daemon_health(address, timeout=2)
+    except OSError:
+        print(f"Daemon não encontrado em {address}; resolvendo neste processo.")
+        return None
+    except DaemonError as e:
+        print(f"Resposta inesperada de {address} ({e}); resolvendo neste processo.")
+        return None
+    if not same_wordlist(health, words_file):
+        print(f"O daemon em {address} usa outra lista de palavras ({health['wordlist']}); "
+              f"resolvendo neste processo.")
+        return None
+    
+    print(f"\n{'='*60}")
+    print(f"ETAPA: Resolvendo o grid com o daemon em {address} (pid {health['pid']})")
+    print(f"{'='*60}\n")
+    start_time = time.time()
+    with open(grid_file) as f:
+        request = {'name': grid_file, 'grid': f.read(), 'options': options}
+    try:
+        result = call_daemon(address, 'POST', '/solve', request)
+        if any(field not in result for field in RESULT_FIELDS):
+            raise DaemonError("resposta sem os campos de um resultado")
+    except (OSError, DaemonError) as e:
+        print(f"Erro do daemon: {e}; resolvendo neste processo.")
+        return None
+    write_outputs(grid_file, result)
+    
+    stats = result['stats']
+    print(f"Status: {result['status']}, {stats['nodes']} nós, busca em {stats['elapsed_time']:.2f} segundos "
+          f"(solver: {result['total_time']:.2f} s, com a comunicação: {time.time() - start_time:.2f} s)")
+    return result
+
+def solve_in_process(grid_file, words_file, dictionary, options):
+    """Solve the grid with the solver in this process, like crossword_csp.py; returns the result."""
+    print(f"\n{'='*60}")
+    print("ETAPA: Resolvendo o grid com o solver CSP")
+    print(f"{'='*60}\n")
+    start_time = time.time()
+    solver = CrosswordCSP(grid_file, words_file, dictionary=dictionary, **options)
+    solver.run()
+    print(f"Tempo total: {time.time() - start_time:.2f} segundos")
+    return {'status': solver.status,
+            'solution': solver.get_filled_grid() if solver.status == 'solved' else None,
+            'stats': solver.stats_report(), 'log': solver.log_text()}
+
 def main():
     parser = argparse.ArgumentParser(description='Executa o fluxo completo de solução para um grid de palavras cruzadas')
     parser.add_argument('grid', help='Arquivo do grid a ser processado')
     parser.add_argument('--wordlist', default='input_files/lista_palavras.txt', 
                       help='Arquivo com a lista de palavras (default: input_files/lista_palavras.txt)')
+    parser.add_argument('--daemon', default=DEFAULT_ADDRESS,
+                      help=f'Endereço do solver_daemon.py, host:porta ou unix:<socket> (default: {DEFAULT_ADDRESS})')
+    parser.add_argument('--no-daemon', action='store_true',
+                      help='Resolve neste processo mesmo que haja um daemon rodando')
+    parser.add_argument('--time-limit', type=float, default=None,
+                      help='Tempo máximo de busca, em segundos')
+    parser.add_argument('--seed', type=int, default=None,
+                      help='Semente para o desempate das heurísticas')
+    parser.add_argument('--propagation', choices=['fc', 'mac'], default='fc',
+                      help='Propagação de restrições durante a busca (default: fc)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                      help=f'Diretório do cache de resultados (default: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--cache-size', type=float, default=DEFAULT_CACHE_SIZE,
+                      help=f'Tamanho máximo do cache de resultados, em MB (default: {DEFAULT_CACHE_SIZE})')
+    parser.add_argument('--no-cache', action='store_true',
+                      help='Resolve o grid mesmo que haja uma solução no cache, sem gravar nele')
     
     args = parser.parse_args()
     
@@ -60,13 +300,30 @@ def main():
     
     start_total = time.time()
     
-    # Etapa 1: Resolver o grid com CSP
-    solve_success = run_command(
-        ['python3', 'crossword_csp.py', args.grid, '--wordlist', args.wordlist],
-        "Resolvendo o grid com o solver CSP"
-    )
+    # Etapa 1: Resolver o grid com CSP, no daemon se houver um rodando
+    # O cache é consultado antes, pela soma do grid, da lista de palavras e das opções.
+    # time_limit vai sempre ao daemon (null sem --time-limit), para que ele não aplique
+    # o seu limite padrão e o grid tenha o mesmo limite dentro e fora dele.
+    options = {'time_limit': args.time_limit, 'seed': args.seed, 'propagation': args.propagation}
+    dictionary = WordDictionary(args.wordlist)
+    cache = key = None
+    if not args.no_cache:
+        cache = ResultCache(args.cache_dir, args.cache_size * 2**20)
+        key = cache.key(args.grid, dictionary.wordlist_digest(), options)
+    
+    result = cached = None
+    if cache is not None:
+        result = cached = solve_from_cache(cache, key, args.grid, args.wordlist, dictionary, options)
+    if result is None and not args.no_daemon:
+        result = solve_with_daemon(args.grid, args.wordlist, args.daemon, options)
+    if result is None:
+        result = solve_in_process(args.grid, args.wordlist, dictionary, options)
+    
+    if cache is not None and cached is None and result['status'] == 'solved':
+        cache.put(key, {'grid': args.grid, 'created': time.time(), 'status': result['status'],
+                        'solution': result['solution'], 'log': result['log'], 'stats': result['stats']})
     
-    if not solve_success:
+    if result['status'] == 'budget':
         print("Erro ao resolver o grid. Abortando.")
         return 1
     
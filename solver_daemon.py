@@ -0,0 +1,350 @@
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import argparse
+import socketserver
+import threading
+import http.client
+import multiprocessing
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from crossword_csp import CrosswordCSP, WordDictionary, INDEX_BACKENDS, SEARCHES, PROPAGATIONS, np, wordlist_digest
+
+DEFAULT_ADDRESS = '127.0.0.1:8765'
+DEFAULT_TIME_LIMIT = 60.0  # Segundos de busca por requisição quando ela não define time_limit
+
+# Opções do solver aceitas em uma requisição e o tipo de cada uma
+REQUEST_OPTIONS = {'time_limit': float, 'node_limit': int, 'seed': int, 'propagation': str,
+                   'search': str, 'restarts': str, 'distinct_words': bool}
+
+# Tipos JSON aceitos para cada tipo de opção (um inteiro serve onde se espera um float)
+OPTION_JSON_TYPES = {int: int, float: (int, float), str: str}
+
+# Campos do /health e do /solve que os clientes usam
+HEALTH_FIELDS = ('pid', 'wordlist', 'wordlist_size', 'wordlist_mtime', 'wordlist_sha256')
+RESULT_FIELDS = ('status', 'solution', 'stats', 'log', 'total_time')
+
+# Dicionário carregado e indexado na partida do daemon. O pool de --workers
+# é criado depois, então solve_request o encontra em cada processo sem recarregá-lo
+_dictionary = None
+
+
+class DaemonError(Exception):
+    """Raised when the daemon answers a request with an error."""
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection over a Unix socket."""
+
+    def __init__(self, socket_path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def open_connection(address, timeout=None):
+    """Connection to a daemon address: 'host:port' or 'unix:<socket path>'."""
+    if address.startswith('unix:'):
+        return UnixHTTPConnection(address[len('unix:'):], timeout)
+    host, _, port = address.rpartition(':')
+    return http.client.HTTPConnection(host or '127.0.0.1', int(port), timeout=timeout)
+
+
+def call_daemon(address, method, path, payload=None, timeout=None):
+    """Send a request to the daemon and return its JSON answer.
+
+    Raises OSError when no server listens at address and DaemonError when it
+    answers with an error or with something other than a JSON object.
+    """
+    connection = open_connection(address, timeout)
+    try:
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        data = response.read()
+    except http.client.HTTPException as e:
+        raise DaemonError(f"resposta HTTP inválida: {e!r}") from None
+    finally:
+        connection.close()
+
+    # A resposta pode vir de outro serviço no mesmo endereço: o corpo só é usado se for JSON
+    try:
+        data = json.loads(data)
+    except ValueError:
+        data = None
+    if response.status != 200:
+        error = data.get('error') if isinstance(data, dict) else None
+        raise DaemonError(error or f'HTTP {response.status}')
+    if not isinstance(data, dict):
+        raise DaemonError("a resposta não é um objeto JSON")
+    return data
+
+
+def daemon_health(address, timeout=None):
+    """The /health answer of the solver daemon at address.
+
+    Raises OSError when no server listens at address and DaemonError when
+    the server there is not a solver daemon.
+    """
+    health = call_daemon(address, 'GET', '/health', timeout=timeout)
+    if health.get('status') != 'ok' or any(field not in health for field in HEALTH_FIELDS):
+        raise DaemonError(f"{address} não é um solver_daemon")
+    return health
+
+
+def same_wordlist(health, words_file):
+    """Whether the daemon described by health serves the words of words_file.
+
+    The same path, size and modification time are enough; otherwise the
+    contents are hashed and compared.
+    """
+    stat = os.stat(words_file)
+    if (health['wordlist'], health['wordlist_size'], health['wordlist_mtime']) == (
+            os.path.realpath(words_file), stat.st_size, stat.st_mtime):
+        return True
+    return wordlist_digest(words_file).hex() == health['wordlist_sha256']
+
+
+def parse_options(options, default_time_limit):
+    """Validate the solver options of a request; raises ValueError on bad ones.
+
+    Values must already have the option's JSON type: no strings for numbers,
+    no fractions for integers and no booleans for anything but flags. A
+    request without time_limit gets default_time_limit; time_limit null asks
+    for no limit, as when the solver runs in-process.
+    """
+    if not isinstance(options, dict):
+        raise ValueError("'options' deve ser um objeto JSON")
+    unknown = sorted(set(options) - set(REQUEST_OPTIONS))
+    if unknown:
+        raise ValueError(f"opções desconhecidas: {', '.join(unknown)}")
+    parsed = {}
+    for name, value in options.items():
+        if value is None:
+            if name == 'time_limit':
+                parsed[name] = None  # Pedido explícito de busca sem limite de tempo
+            continue
+        kind = REQUEST_OPTIONS[name]
+        if kind is bool:
+            if not isinstance(value, bool):
+                raise ValueError(f"'{name}' deve ser true ou false")
+        elif isinstance(value, bool) or not isinstance(value, OPTION_JSON_TYPES[kind]):
+            # bool é subclasse de int: true não pode virar 1, nem 1.5 virar 1
+            raise ValueError(f"valor inválido para '{name}': {value!r}")
+        parsed[name] = kind(value)
+    if parsed.get('propagation', 'fc') not in PROPAGATIONS:
+        raise ValueError(f"'propagation' deve ser um de {', '.join(PROPAGATIONS)}")
+    if parsed.get('search', 'backtrack') not in SEARCHES:
+        raise ValueError(f"'search' deve ser um de {', '.join(SEARCHES)}")
+    if parsed.get('restarts') not in (None, 'luby'):
+        raise ValueError("'restarts' deve ser 'luby'")
+    parsed.setdefault('time_limit', default_time_limit)
+    return parsed
+
+
+def solve_request(name, grid_text, options):
+    """Pool entry point: solve a grid given as text with the dictionary inherited from the daemon."""
+    start = time.time()
+    solver = CrosswordCSP(name, _dictionary.words_file, dictionary=_dictionary, **options)
+    solver.load_grid(grid_text)
+    solver.identify_slots()
+    solver.load_words()
+    solver.initialize_domains()
+    solver.solve()
+    return {'status': solver.status,
+            'solution': solver.get_filled_grid() if solver.status == 'solved' else None,
+            'stats': solver.stats_report(), 'log': solver.log_text(),
+            'total_time': time.time() - start}
+
+
+class SolverHandler(BaseHTTPRequestHandler):
+    """HTTP interface of the daemon: GET /health and POST /solve."""
+    server_version = 'CrosswordSolver/1.0'
+
+    def do_GET(self):
+        if self.path != '/health':
+            self.send_json(404, {'error': f"caminho desconhecido: {self.path}"})
+            return
+        self.send_json(200, self.server.health())
+
+    def do_POST(self):
+        if self.path != '/solve':
+            self.send_json(404, {'error': f"caminho desconhecido: {self.path}"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            grid_text = request.get('grid')
+            if not isinstance(grid_text, str) or not grid_text.strip():
+                raise ValueError("'grid' deve ser o texto do grid")
+            options = parse_options(request.get('options', {}), self.server.default_time_limit)
+            name = str(request.get('name', 'request'))
+        except (ValueError, TypeError, AttributeError) as e:
+            self.send_json(400, {'error': f"requisição inválida: {e}"})
+            return
+
+        try:
+            result = self.server.pool.apply(solve_request, (name, grid_text, options))
+        except Exception as e:
+            self.send_json(500, {'error': f"erro ao resolver o grid: {e}"})
+            return
+        self.server.count_request()
+        self.send_json(200, result)
+
+    def send_json(self, code, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Clientes de um socket Unix não têm endereço
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format, *args):
+        print(f"[{time.strftime('%H:%M:%S')}] {self.address_string()} {format % args}", flush=True)
+
+
+class SolverServer(ThreadingHTTPServer):
+    """HTTP server that hands every solve request to a pool of forked solver processes.
+
+    Each connection is served by its own thread, which waits for a pool
+    process, so up to `workers` grids are solved at the same time and the
+    rest wait in the pool queue.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, pool, dictionary, workers, default_time_limit):
+        self.pool = pool
+        self.dictionary = dictionary
+        self.wordlist_path = os.path.realpath(dictionary.words_file)
+        self.workers = workers
+        self.default_time_limit = default_time_limit
+        self.started = time.time()
+        self.requests = 0
+        self.lock = threading.Lock()
+        super().__init__(address, SolverHandler)
+
+    def count_request(self):
+        with self.lock:
+            self.requests += 1
+
+    def health(self):
+        """Status of the daemon and of the dictionary it serves.
+
+        The wordlist is described as it was when the words were loaded, not as
+        it is now, so a client whose wordlist was edited since then sees a
+        different one.
+        """
+        stat = self.dictionary.stat
+        return {'status': 'ok', 'pid': os.getpid(), 'workers': self.workers,
+                'uptime': time.time() - self.started, 'requests': self.requests,
+                'wordlist': self.wordlist_path, 'wordlist_size': stat.st_size,
+                'wordlist_mtime': stat.st_mtime, 'wordlist_sha256': self.dictionary.wordlist_digest().hex(),
+                'backend': self.dictionary.backend, 'default_time_limit': self.default_time_limit,
+                'lengths': {length: len(words) for length, words in sorted(self.dictionary.words_by_length.items())}}
+
+
+class UnixSolverServer(SolverServer):
+    """SolverServer listening on a Unix socket."""
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        # HTTPServer.server_bind espera um endereço (host, porta)
+        socketserver.TCPServer.server_bind(self)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+def create_server(address, pool, dictionary, workers, default_time_limit):
+    """Bind the daemon to 'host:port' or 'unix:<socket path>'."""
+    if address.startswith('unix:'):
+        path = address[len('unix:'):]
+        if os.path.exists(path):
+            # Um socket que não aceita conexões sobrou de um daemon encerrado
+            try:
+                daemon_health(address, timeout=2)
+            except (OSError, DaemonError):
+                os.unlink(path)
+            else:
+                raise OSError(f"já existe um daemon em {path}")
+        return UnixSolverServer(path, pool, dictionary, workers, default_time_limit)
+    host, _, port = address.rpartition(':')
+    return SolverServer((host or '127.0.0.1', int(port)), pool, dictionary, workers, default_time_limit)
+
+
+def main():
+    global _dictionary
+
+    parser = argparse.ArgumentParser(description='Mantém o dicionário e os índices carregados e resolve grids '
+                                                 'recebidos por HTTP (localhost ou socket Unix)')
+    parser.add_argument('--wordlist', default='input_files/lista_palavras.txt',
+                        help='Arquivo com a lista de palavras (default: input_files/lista_palavras.txt)')
+    parser.add_argument('--dict-file', default=None,
+                        help='Dicionário compilado (default: <wordlist>.cwdict)')
+    parser.add_argument('--backend', choices=sorted(INDEX_BACKENDS), default='bitset',
+                        help='Representação dos domínios: bitsets de inteiros ou máscaras numpy (default: bitset)')
+    parser.add_argument('--listen', default=DEFAULT_ADDRESS,
+                        help=f'Endereço host:porta ou unix:<caminho do socket> (default: {DEFAULT_ADDRESS})')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Número de processos que resolvem grids ao mesmo tempo (default: número de CPUs)')
+    parser.add_argument('--time-limit', type=float, default=DEFAULT_TIME_LIMIT,
+                        help=f'Tempo máximo de busca das requisições que não definem time_limit '
+                             f'(default: {DEFAULT_TIME_LIMIT:.0f})')
+
+    args = parser.parse_args()
+
+    # Verifica se a lista de palavras existe
+    if not os.path.exists(args.wordlist):
+        print(f"Erro: Arquivo de palavras '{args.wordlist}' não encontrado.")
+        return 1
+
+    if args.backend == 'numpy' and np is None:
+        print("Erro: O backend numpy requer o numpy (pip install numpy).")
+        return 1
+
+    # Carrega todas as palavras e índices antes de criar o pool, que os herda
+    start = time.time()
+    print(f"Carregando palavras de {args.wordlist}...")
+    _dictionary = WordDictionary(args.wordlist, args.dict_file, args.backend)
+    _dictionary.load()
+    _dictionary.wordlist_digest()  # Logo após a carga, para descrever as palavras carregadas
+    for length in sorted(_dictionary.words_by_length):
+        _dictionary.index(length)
+    print(f"Dicionário e índices ({len(_dictionary.indexes)} comprimentos) prontos em "
+          f"{time.time() - start:.2f} segundos")
+
+    pool = multiprocessing.get_context('fork').Pool(args.workers)
+    try:
+        server = create_server(args.listen, pool, _dictionary, args.workers, args.time_limit)
+    except OSError as e:
+        pool.terminate()
+        print(f"Erro: Não foi possível escutar em {args.listen}: {e}")
+        return 1
+
+    # SIGTERM (kill) encerra como o Ctrl+C, removendo o socket e o pool
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f"Servindo em {args.listen} com {args.workers} processo(s); Ctrl+C encerra")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nEncerrando...")
+    finally:
+        server.server_close()
+        pool.terminate()
+        if args.listen.startswith('unix:') and os.path.exists(args.listen[len('unix:'):]):
+            os.unlink(args.listen[len('unix:'):])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
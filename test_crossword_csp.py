@@ -0,0 +1,138 @@
+import random
+
+import pytest
+
+from crossword_csp import CrosswordCSP, NogoodStore
+
+
+def make_solver(tmp_path, rows, words, **options):
+    """A solver for the grid rows and the words, written to tmp_path, ready to search."""
+    grid_file = tmp_path / 'grid.txt'
+    words_file = tmp_path / 'words.txt'
+    grid_file.write_text('\n'.join(rows) + '\n')
+    words_file.write_text('\n'.join(words) + '\n')
+    solver = CrosswordCSP(str(grid_file), str(words_file), **options)
+    solver.load_grid()
+    solver.identify_slots()
+    solver.load_words()
+    solver.initialize_domains()
+    return solver
+
+
+def random_words(seed, lengths, count, letters):
+    """count random words of every length, drawn from letters."""
+    rng = random.Random(seed)
+    return [''.join(rng.choice(letters) for _ in range(length)) for length in lengths for _ in range(count)]
+
+
+def check_solution(assignment, words):
+    """Every slot holds a word of the list and crossing slots agree on their shared cells."""
+    letters = {}
+    for (direction, i, j, length), word in assignment.items():
+        assert word in words and len(word) == length
+        for k, letter in enumerate(word):
+            cell = (i, j + k) if direction == 'H' else (i + k, j)
+            assert letters.setdefault(cell, letter) == letter
+
+
+# Grid with a block: slots of length 4, 2 and 3. With random_words(seed, (2, 3, 4), 12, 'ABCDEF')
+# about half of the seeds are solvable, a few only after some search
+TINY_ROWS = ['????', '?.??', '????']
+# Open grid that takes several hundred nodes to solve with these words
+OPEN_ROWS = ['?????'] * 5
+OPEN_WORDS = random_words(1, (5,), 150, 'ABCDEFGH')
+
+
+def test_single_cell_nogood():
+    """A conflict on one cell stores a nogood that watches its only pair."""
+    store = NogoodStore(10)
+    nogood = frozenset({((0, 0), 'A')})
+    store.add(nogood, [((0, 0), 'A')])
+    assert store.patterns([(0, 0)], {}) == [((((0, 0), 'A'),), nogood)]
+    
+    # Placing the letter makes the watched pair hold; there is no other pair to watch
+    store.placed({(0, 0): 'A'}, {(0, 0): 'A'})
+    assert store.nogoods[nogood] == [((0, 0), 'A')]
+    assert nogood in store.watchers[(0, 0)]
+
+
+def test_touch_evicted_nogood():
+    """A nogood matched at a node may be evicted by the nogoods its subtree learns."""
+    store = NogoodStore(1)
+    first = frozenset({((0, 0), 'A'), ((0, 1), 'B')})
+    second = frozenset({((1, 0), 'C'), ((1, 1), 'D')})
+    store.add(first, sorted(first))
+    store.add(second, sorted(second))
+    assert first not in store.nogoods
+    
+    store.touch(first)
+    assert list(store.nogoods) == [second]
+    assert (0, 0) not in store.watchers and (0, 1) not in store.watchers
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_cbj_agrees_with_backtracking(tmp_path, seed):
+    """Backjumping and nogoods never change whether a grid has a solution."""
+    words = random_words(seed, (2, 3, 4), 12, 'ABCDEF')
+    backtrack = make_solver(tmp_path, TINY_ROWS, words, search='backtrack')
+    cbj = make_solver(tmp_path, TINY_ROWS, words, search='cbj')
+    assert backtrack.solve() == cbj.solve()
+    assert backtrack.status == cbj.status
+    if cbj.status == 'solved':
+        check_solution(cbj.assignment, words)
+
+
+@pytest.mark.parametrize('search', ['backtrack', 'cbj'])
+def test_resume_matches_uninterrupted(tmp_path, search):
+    """A search stopped by its node limit and resumed from the checkpoint ends like one never stopped."""
+    uninterrupted = make_solver(tmp_path, OPEN_ROWS, OPEN_WORDS, search=search)
+    assert uninterrupted.solve()
+    assert uninterrupted.stats.nodes > 300
+    
+    checkpoint_file = str(tmp_path / 'search.ckpt')
+    stopped = make_solver(tmp_path, OPEN_ROWS, OPEN_WORDS, search=search, node_limit=300,
+                          checkpoint_file=checkpoint_file)
+    assert not stopped.solve()
+    assert stopped.status == 'budget'
+    
+    resumed = make_solver(tmp_path, OPEN_ROWS, OPEN_WORDS, search=search, resume_file=checkpoint_file)
+    assert resumed.solve()
+    assert resumed.assignment == uninterrupted.assignment
+    assert resumed.stats.nodes == uninterrupted.stats.nodes
+
+
+@pytest.mark.parametrize('seed, letters', [(seed, 'ABCDEF') for seed in range(10)] + [(0, 'ABCD')])
+def test_count_matches_enumeration(tmp_path, seed, letters):
+    """Counting with cached components finds as many solutions as enumerating them."""
+    words = random_words(seed, (2, 3, 4), 12, letters)
+    solutions = list(make_solver(tmp_path, TINY_ROWS, words).iter_solutions())
+    assert make_solver(tmp_path, TINY_ROWS, words).count_solutions() == len(solutions)
+    assert len({tuple(sorted(solution.items())) for solution in solutions}) == len(solutions)
+
+
+def test_numpy_backend_matches_bitset(tmp_path):
+    """Both domain representations run the same search."""
+    pytest.importorskip('numpy')
+    bitset = make_solver(tmp_path, OPEN_ROWS, OPEN_WORDS, backend='bitset')
+    numpy = make_solver(tmp_path, OPEN_ROWS, OPEN_WORDS, backend='numpy')
+    assert bitset.solve() and numpy.solve()
+    assert numpy.assignment == bitset.assignment
+    assert numpy.stats.nodes == bitset.stats.nodes
+
+
+def test_distinct_words(tmp_path):
+    """With distinct words no word fills two slots: the solutions are those without a repeated word."""
+    rows = ['??', '??']
+    repeated = make_solver(tmp_path, rows, ['AA'])
+    assert repeated.solve()
+    assert set(repeated.assignment.values()) == {'AA'}
+    assert not make_solver(tmp_path, rows, ['AA'], distinct_words=True).solve()
+    
+    words = random_words(0, (2, 3, 4), 12, 'ABCD')
+    solutions = list(make_solver(tmp_path, TINY_ROWS, words).iter_solutions())
+    expected = {tuple(sorted(solution.items())) for solution in solutions
+                if len(set(solution.values())) == len(solution)}
+    assert 0 < len(expected) < len(solutions)
+    distinct = make_solver(tmp_path, TINY_ROWS, words, distinct_words=True)
+    assert {tuple(sorted(solution.items())) for solution in distinct.iter_solutions()} == expected
+    assert make_solver(tmp_path, TINY_ROWS, words, distinct_words=True).count_solutions() == len(expected)